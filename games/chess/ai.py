@@ -1,11 +1,23 @@
+import os
 from joueur.base_ai import BaseAI
-from math import inf
-from timeit import default_timer as timer
-from collections import namedtuple, defaultdict
-from itertools import count
-from random import getrandbits
-from operator import xor
-import re
+from collections import namedtuple
+from games.chess import bitboard
+from games.chess.search_board import fen_to_search_board, PositionStack, static_exchange, WHITE
+from games.chess.move_tables import step_moves, ray_moves, step_squares, ray_squares, pawn_push_moves, \
+    pawn_double_moves, pawn_capture_moves, pawn_capture_squares
+from games.chess.zobrist import frame_keys, ep_keys, castling_keys, black_key, castling_index, swap_castling_index, \
+    SIDE_BIT
+from games.chess.evaluation import pst, phase_weights, piece_values, board_score, board_phase
+from games.chess.eval_cache import evaluate, eval_cache, pawn_hash, EVAL_CACHE_MB, PAWN_HASH_MB
+from games.chess.transposition import TranspositionTable, EXACT
+from games.chess.search import Searcher, MAX_PLY
+from games.chess.time_manager import TimeManager
+from games.chess.ponder import Ponderer
+from games.chess.smp import LazySMP
+from games.chess.distributed import Coordinator
+from games.chess.polyglot import OpeningBook, polyglot_key
+from games.chess.position_cache import PositionCache, board_salt, CACHE_DEPTH
+from games.chess.bitbases import Bitbases, default_directory
 
 '''
 This board representation is based off the Sunfish Python Chess Engine 
@@ -32,99 +44,93 @@ initial = (
 
 N, E, S, W = -10, 1, 10, -1
 
-# valid moves for each piece
-directions = {
-    'P': (N, N + N, N + W, N + E),
-    'N': (N + N + E, E + N + E, E + S + E, S + S + E, S + S + W, W + S + W, W + N + W, N + N + W),
-    'B': (N + E, S + E, S + W, N + W),
-    'R': (N, E, S, W),
-    'Q': (N, E, S, W, N + E, S + E, S + W, N + W),
-    'K': (N, E, S, W, N + E, S + E, S + W, N + W)
-}
-
-piece_values = {
-    'P': 1,
-    'N': 3,
-    'B': 3,
-    'R': 5,
-    'Q': 9,
-    'K': 200
-}
-
-z_indicies = {
-    'P': 1,
-    'N': 2,
-    'B': 3,
-    'R': 4,
-    'Q': 5,
-    'K': 6,
-    'p': 7,
-    'n': 8,
-    'b': 9,
-    'r': 10,
-    'q': 11,
-    'k': 12
-}
-
-# initialize Zobrist hash table
-z_table = [[None] * 12] * 64
-for i in range(0, 64):
-    for j in range(0, 12):
-        z_table[i][j] = getrandbits(16)
-
 
-class Position(namedtuple('Position', 'board score wc bc ep kp depth captured')):
+class Position(namedtuple('Position', 'board score wc bc ep kp depth captured hash phase pawn_hash')):
     """ A state of a chess game
     board -- a 120 char representation of the board
-    score -- the board evaluation
+    score -- the packed piece-square-table evaluation, kept up to date by move
     wc -- the castling rights, [west/queen side, east/king side]
     bc -- the opponent castling rights, [west/king side, east/queen side]
     ep - the en passant square
     kp - the king passant square
     depth - the node depth of the position
     captured - the piece that was captured as the result of the last move
+    hash - the 64-bit Zobrist hash, kept up to date by move, rotate and nullmove, its lowest bit set with black to move
+    phase - the game phase, from 24 with all pieces on the board down to 0 with only kings and pawns
+    pawn_hash - the Zobrist key of the pawns alone, for the pawn hash
     """
 
-    def gen_moves(self):
-        for i, p in enumerate(self.board):
+    def gen_moves(self, tactical=True, quiet=True):
+        # tactical - generate captures and promotions
+        # quiet - generate every other move
+        board = self.board
+        for i, p in enumerate(board):
             # i - initial position index
             # p - piece code
 
             # if the piece doesn't belong to us, skip it
             if not p.isupper(): continue
-            for d in directions[p]:
-                # d - potential action for a given piece
-                for j in count(i + d, d):
-                    # j - final position index
-                    # q - occupying piece code
-                    q = self.board[j]
-                    # Stay inside the board, and off friendly pieces
-                    if q.isspace() or q.isupper(): break
-                    # Pawn move, double move and capture
-                    if p == 'P' and d in (N, N + N) and q != '.': break
-                    if p == 'P' and d == N + N and (i < A1 + N or self.board[i + N] != '.'): break
-                    if p == 'P' and d in (N + W, N + E) and q == '.' and j not in (self.ep, self.kp): break
-                    # Move it
-                    yield (i, j)
-                    # Stop non-sliders from sliding and sliding after captures
-                    if p in 'PNK' or q.islower(): break
-                    # Castling by sliding rook next to king
-                    if i == A1 and self.board[j + E] == 'K' and self.wc[0]: yield (j + E, j + W)
-                    if i == H1 and self.board[j + W] == 'K' and self.wc[1]: yield (j + W, j + E)
+            if p == 'P':
+                # Pawn move, double move and capture
+                move = pawn_push_moves[N][i]
+                if board[move[1]] == '.':
+                    if A8 <= move[1] <= H8:
+                        if tactical: yield move
+                    elif quiet:
+                        yield move
+                        move = pawn_double_moves[N][i]
+                        if move and board[move[1]] == '.': yield move
+                if tactical:
+                    for move in pawn_capture_moves[N][i]:
+                        if board[move[1]].islower() or move[1] in (self.ep, self.kp): yield move
+            elif p in 'NK':
+                # Non-sliders stay off friendly pieces
+                for move in step_moves[p][i]:
+                    q = board[move[1]]
+                    if q == '.':
+                        if quiet: yield move
+                    elif tactical and q.islower():
+                        yield move
+            else:
+                for ray in ray_moves[p][i]:
+                    for move in ray:
+                        # j - final position index
+                        # q - occupying piece code
+                        j = move[1]
+                        q = board[j]
+                        # Stay off friendly pieces
+                        if q.isupper(): break
+                        # Stop sliding after captures
+                        if q != '.':
+                            if tactical: yield move
+                            break
+                        if not quiet: continue
+                        yield move
+                        # Castling by sliding rook next to king
+                        if i == A1 and board[j + E] == 'K' and self.wc[0]: yield (j + E, j + W)
+                        if i == H1 and board[j + W] == 'K' and self.wc[1]: yield (j + W, j + E)
 
     def rotate(self):
-        # Rotates the board, preserving enpassant
+        # Rotates the board, preserving enpassant and the captured piece
         # Allows logic to be reused, as only one board configuration must be considered
+        # The piece keys follow the pieces and the ep keys are symmetric, so only the side and the castling owners
+        # change in the hash
+        c = castling_index(self.wc, self.bc)
         return Position(
             self.board[::-1].swapcase(), -self.score, self.bc, self.wc,
             119 - self.ep if self.ep else 0,
-            119 - self.kp if self.kp else 0, self.depth, None)
+            119 - self.kp if self.kp else 0, self.depth, self.captured,
+            self.hash ^ black_key ^ castling_keys[c] ^ castling_keys[swap_castling_index(c)], self.phase,
+            self.pawn_hash)
 
     def nullmove(self):
         # Like rotate, but clears ep and kp
+        c = castling_index(self.wc, self.bc)
         return Position(
             self.board[::-1].swapcase(), -self.score,
-            self.bc, self.wc, 0, 0, self.depth + 1, None)
+            self.bc, self.wc, 0, 0, self.depth + 1, None,
+            self.hash ^ black_key ^ castling_keys[c] ^ castling_keys[swap_castling_index(c)] ^ ep_keys[self.ep],
+            self.phase, self.pawn_hash)
 
     def move(self, move):
         # i - original position index
@@ -138,10 +144,21 @@ class Position(namedtuple('Position', 'board score wc bc ep kp depth captured'))
         # copy variables and reset eq and kp and increment depth
         board = self.board
         wc, bc, ep, kp, depth = self.wc, self.bc, 0, 0, self.depth + 1
-        # score = self.score + self.value(move)
+        # h - hash with the old ep square and castling rights removed
+        h = self.hash ^ ep_keys[self.ep] ^ castling_keys[castling_index(wc, bc)]
+        # the piece keys of the frame the board is seen in
+        piece_keys = frame_keys[self.hash & SIDE_BIT]
+        # score and phase change by the table entries of the pieces that move or leave the board
+        score = self.score + pst[p][j] - pst[p][i] - pst[q][j]
+        phase = self.phase - phase_weights.get(q.upper(), 0)
         # perform the move
         board = put(board, j, board[i])
         board = put(board, i, '.')
+        h ^= piece_keys[p][i] ^ piece_keys[p][j] ^ piece_keys[q][j]
+        # ph - the pawn key, changed by pawns moving, promoting or being taken
+        ph = self.pawn_hash
+        if q == 'p':
+            ph ^= piece_keys['p'][j]
         # update castling rights, if we move our rook or capture the opponent's rook
         if i == A1: wc = (False, wc[1])
         if i == H1: wc = (wc[0], False)
@@ -154,50 +171,238 @@ class Position(namedtuple('Position', 'board score wc bc ep kp depth captured'))
                 kp = (i + j) // 2
                 board = put(board, A1 if j < i else H1, '.')
                 board = put(board, kp, 'R')
+                h ^= piece_keys['R'][A1 if j < i else H1] ^ piece_keys['R'][kp]
+                score += pst['R'][kp] - pst['R'][A1 if j < i else H1]
         # Pawn promotion, double move, and en passant capture
         if p == 'P':
+            ph ^= piece_keys['P'][i] ^ piece_keys['P'][j]
             if A8 <= j <= H8:
                 # Promote the pawn to Queen
                 board = put(board, j, 'Q')
+                h ^= piece_keys['P'][j] ^ piece_keys['Q'][j]
+                ph ^= piece_keys['P'][j]
+                score += pst['Q'][j] - pst['P'][j]
+                phase += phase_weights['Q']
             if j - i == 2 * N:
                 ep = i + N
             if j - i in (N + W, N + E) and q == '.':
                 board = put(board, j + S, '.')
+                h ^= piece_keys['p'][j + S]
+                ph ^= piece_keys['p'][j + S]
+                score -= pst['p'][j + S]
+        h ^= ep_keys[ep] ^ castling_keys[castling_index(wc, bc)]
         # Rotate the returned position so it's ready for the next player
-        return Position(board, 0, wc, bc, ep, kp, depth, q.upper()).rotate()
+        return Position(board, score, wc, bc, ep, kp, depth, q.upper() if q != '.' else None, h, phase, ph).rotate()
 
     def value(self):
-        score = 0
-        # evaluate material advantage
-        for k, p in enumerate(self.board):
-            # k - position index
-            # p - piece code
-            if p.isupper(): score += piece_values[p]
-            if p.islower(): score -= piece_values[p.upper()]
-        return score
-
-    def is_check(self):
-        # returns if the state represented by the current position is check
-        op_board = self.nullmove()
-        for move in op_board.gen_moves():
+        # the tapered evaluation, blended from the incrementally kept score, pawn structure included
+        black = self.hash & SIDE_BIT
+        return evaluate(self, -self.score if black else self.score, black)
+
+    def pawn_masks(self):
+        # the white and the black pawns as bitboards, a1 = 0, turned back from the frame the board is seen in
+        masks = [0, 0]
+        black = self.hash & SIDE_BIT
+        for i, p in enumerate(self.board):
+            if p in 'Pp':
+                k = 119 - i if black else i
+                masks[(p == 'p') ^ black] |= 1 << (9 - k // 10) * 8 + k % 10 - 1
+        return masks
+
+    def king_squares(self):
+        # the squares of the white and the black king, a1 = 0, or -1 for a missing king
+        black = self.hash & SIDE_BIT
+        kings = []
+        for king in ('k', 'K') if black else ('K', 'k'):
+            i = self.board.find(king)
+            k = 119 - i if black else i
+            kings.append((9 - k // 10) * 8 + k % 10 - 1 if i >= 0 else -1)
+        return kings
+
+    def pins_and_checks(self):
+        # looks outward from our king once, returning
+        # checkers - the number of pieces giving check
+        # evasions - the squares a piece other than the king can move to while in a single check
+        # pins - pinned square -> the squares that piece may move to without uncovering the king
+        board = self.board
+        king = board.find('K')
+        checkers, evasions, pins = 0, None, {}
+        for j in pawn_capture_squares[N][king]:
+            if board[j] == 'p':
+                checkers, evasions = checkers + 1, (j,)
+        for j in step_squares['N'][king]:
+            if board[j] == 'n':
+                checkers, evasions = checkers + 1, (j,)
+        for sliders, rays in ('bq', ray_squares['B'][king]), ('rq', ray_squares['R'][king]):
+            for ray in rays:
+                pinned = None
+                for n, j in enumerate(ray):
+                    q = board[j]
+                    if q == '.': continue
+                    if q.isupper():
+                        # the first of our pieces on the ray might be pinned, a second one shields it
+                        if pinned is not None: break
+                        pinned = j
+                        continue
+                    if q in sliders:
+                        if pinned is None:
+                            checkers, evasions = checkers + 1, ray[:n + 1]
+                        else:
+                            pins[pinned] = ray[:n + 1]
+                    break
+        return checkers, evasions, pins
+
+    def gen_legal_moves(self, tactical=True, quiet=True, checks=None):
+        # the pseudo-legal moves, filtered by the checks and pins of our king, so no move has to be made to be tested
+        # checks - the result of pins_and_checks, when the caller generates the moves in several batches
+        board = self.board
+        king = board.find('K')
+        if king < 0:
+            yield from self.gen_moves(tactical, quiet)
+            return
+        checkers, evasions, pins = checks or self.pins_and_checks()
+        # the king is lifted off the board when its moves are tested, so it cannot hide from a slider behind itself
+        kingless = board[:king] + '.' + board[king + 1:]
+        for move in self.gen_moves(tactical, quiet):
             i, j = move
-            p, q = op_board.board[i], op_board.board[j]
-            # opponent can take our king
-            if q == 'k':
+            if i == king:
+                if abs(j - i) == 2:
+                    # Castling, the king may not leave, cross or land on an attacked square
+                    if checkers or self.is_attacked((i + j) // 2) or self.is_attacked(j): continue
+                elif self.is_attacked(j, kingless): continue
+                yield move
+                continue
+            if checkers > 1: continue
+            if j == self.ep and board[i] == 'P':
+                # en passant takes two pieces off one rank, so test it on the board
+                after = list(board)
+                after[i], after[j], after[j + S] = '.', 'P', '.'
+                if not self.is_attacked(king, after): yield move
+                continue
+            if checkers and j not in evasions: continue
+            if i in pins and j not in pins[i]: continue
+            yield move
+
+    def is_legal_quiet(self, move, checks):
+        # returns if a move from elsewhere in the tree, such as a killer, is a legal quiet move here,
+        # without generating the moves of the position
+        # checks - the result of pins_and_checks
+        i, j = move
+        board = self.board
+        p = board[i]
+        if not p.isupper() or board[j] != '.':
+            return False
+        if p == 'P':
+            push = pawn_push_moves[N][i]
+            if move == push:
+                if A8 <= j <= H8: return False
+            elif move != pawn_double_moves[N][i] or board[push[1]] != '.':
+                return False
+        elif p in 'NK':
+            # castling is left to the quiet moves of the position
+            if move not in step_moves[p][i]: return False
+        else:
+            for ray in ray_moves[p][i]:
+                if move in ray:
+                    if any(board[k] != '.' for _, k in ray[:ray.index(move)]): return False
+                    break
+            else:
+                return False
+        king = board.find('K')
+        if king < 0:
+            return True
+        checkers, evasions, pins = checks
+        if i == king:
+            return not self.is_attacked(j, board[:king] + '.' + board[king + 1:])
+        if checkers > 1 or checkers and j not in evasions: return False
+        return i not in pins or j in pins[i]
+
+    def is_attacked(self, i, board=None):
+        # returns if square i is attacked by the opponent, on this board or on the given one
+        board = board or self.board
+        # opponent pawns travel south, so they attack from the north
+        for j in pawn_capture_squares[N][i]:
+            if board[j] == 'p':
                 return True
+        for j in step_squares['N'][i]:
+            if board[j] == 'n':
+                return True
+        for j in step_squares['K'][i]:
+            if board[j] == 'k':
+                return True
+        for sliders, rays in ('bq', ray_squares['B'][i]), ('rq', ray_squares['R'][i]):
+            for ray in rays:
+                for j in ray:
+                    if board[j] != '.':
+                        if board[j] in sliders:
+                            return True
+                        break
         return False
 
-    def is_quiescent(self):
-        return self.is_check() or self.captured
+    def move_pieces(self, move):
+        # the moving piece and the piece the move would capture, if any, as uppercase codes
+        i, j = move
+        p, q = self.board[i], self.board[j]
+        if q != '.':
+            return p, q.upper()
+        if p == 'P' and j == self.ep:
+            return p, 'P'
+        return p, None
+
+    def is_tactical(self, move):
+        # returns if the move captures or promotes, the moves the search does not treat as quiet
+        i, j = move
+        return self.board[j] != '.' or (self.board[i] == 'P' and (A8 <= j <= H8 or j == self.ep))
+
+    def see(self, move):
+        # the material the move wins once the exchange on its target square has played out
+        i, j = move
+        if j == self.ep and self.board[i] == 'P':
+            return piece_values['P']
+        return static_exchange(bytearray(self.board, 'ascii'), move, WHITE)
+
+    def has_pieces(self):
+        # returns if the side to move has anything besides pawns and the king
+        return any(p in self.board for p in 'NBRQ')
+
+    def piece_list(self, limit):
+        # returns (piece, square) of every piece on the board, white uppercase and a1 = 0, or None for more than limit
+        board = self.board
+        if 64 - board.count('.') > limit:
+            return None
+        black = self.hash & SIDE_BIT
+        found = []
+        for i, p in enumerate(board):
+            if p.isalpha():
+                # the board is rotated when black is to move
+                if black:
+                    i, p = 119 - i, p.swapcase()
+                found.append((p, (9 - i // 10) * 8 + i % 10 - 1))
+        return found
+
+    def is_check(self):
+        # returns if the side to move is in check
+        king = self.board.find('K')
+        return king >= 0 and self.is_attacked(king)
 
     def z_hash(self):
-        # Zobrist Hash of board position
-        # strip all whitespace from board
-        stripboard = re.sub(r'[\s+]', '', self.board)
+        # Zobrist Hash of board position, recomputed from scratch
+        # The board does not record the side to move, so it is read from the side bit of the kept hash
+        side = self.hash & SIDE_BIT
+        piece_keys = frame_keys[side]
+        h = ep_keys[self.ep] ^ castling_keys[castling_index(self.wc, self.bc)] ^ (black_key if side else 0)
+        for i, p in enumerate(self.board):
+            if p in piece_keys:
+                h ^= piece_keys[p][i]
+        return h
+
+    def pawn_z_hash(self):
+        # the pawn key, recomputed from scratch
+        piece_keys = frame_keys[self.hash & SIDE_BIT]
         h = 0
-        for i in range(0, 64):
-            j = z_indicies.get(stripboard[i], 0)
-            h = xor(h, z_table[i][j - 1])
+        for i, p in enumerate(self.board):
+            if p in 'Pp':
+                h ^= piece_keys[p][i]
         return h
 
 
@@ -221,32 +426,56 @@ def square_rank(square_index):
     return 10 - (square_index // 10)
 
 
-def square_san(square_index):
-    # convert square index (21 - 98) to Standard Algebraic Notation
-    square = namedtuple('square', 'file rank')
-    return square(square_file(square_index), square_rank(square_index))
+Square = namedtuple('Square', 'file rank')
+# the file and rank of every square by mailbox and by bitboard index, and the indices of every (file, rank)
+mailbox_squares = [Square(square_file(i), square_rank(i)) if 0 < i % 10 < 9 and A8 <= i <= H1 else None
+                   for i in range(120)]
+bitboard_squares = [Square(bitboard.square_file(sq), bitboard.square_rank(sq)) for sq in range(64)]
+mailbox_indices = {square: i for i, square in enumerate(mailbox_squares) if square}
+bitboard_indices = {square: sq for sq, square in enumerate(bitboard_squares)}
+
+
+def game_square(board_type, index, black):
+    # the file and rank of a board index, black tells if black is to move on the board
+    if board_type == 'bitboard':
+        return bitboard_squares[index]
+    # only the mailbox Position is rotated for black
+    return mailbox_squares[119 - index if board_type == 'mailbox' and black else index]
+
+
+def board_square(board_type, file, rank, black):
+    # the board index of a square of the game, black tells if black is to move on the board
+    if board_type == 'bitboard':
+        return bitboard_indices[(file, rank)]
+    index = mailbox_indices[(file, rank)]
+    return 119 - index if board_type == 'mailbox' and black else index
+
+
+def book_square(board_type, index, black):
+    # the square of a board index with a1 = 0, as the opening book numbers them
+    if board_type == 'bitboard':
+        return index
+    if board_type == 'mailbox' and black:
+        # only the mailbox Position is rotated for black
+        index = 119 - index
+    return (square_rank(index) - 1) * 8 + (index % 10) - 1
+
+
+# the book moves castling as the king taking its own rook, our boards as the king moving two squares
+book_castling = {(4, 7): (4, 6), (4, 0): (4, 2), (60, 63): (60, 62), (60, 56): (60, 58)}
 
 
 def fen_to_position(fen_string):
     # generate a Position object from a FEN string
     board, player, castling, enpassant, halfmove, move = fen_string.split()
-    board = board.split('/')
-    board_out = '         \n         \n'
-    for row in board:
-        board_out += ' '
-        for piece in row:
-            if piece.isdigit():
-                for _ in range(int(piece)):
-                    board_out += '.'
-            else:
-                board_out += piece
-        board_out += '\n'
-    board_out += '         \n         \n'
+    rows = [' ' + ''.join('.' * int(piece) if piece.isdigit() else piece for piece in row) + '\n'
+            for row in board.split('/')]
+    board_out = ''.join(['         \n         \n'] + rows + ['         \n         \n'])
 
     wc = (False, False)
     bc = (False, False)
-    if 'K' in castling: wc = (True, wc[1])
-    if 'Q' in castling: wc = (wc[0], True)
+    if 'Q' in castling: wc = (True, wc[1])
+    if 'K' in castling: wc = (wc[0], True)
     if 'k' in castling: bc = (True, bc[1])
     if 'q' in castling: bc = (bc[0], True)
 
@@ -255,11 +484,22 @@ def fen_to_position(fen_string):
     else:
         enpassant = 0
 
-    # Position(board score wc bc ep kp depth)
+    # Position(board score wc bc ep kp depth captured hash phase pawn_hash)
+    position = Position(board_out, board_score(board_out), wc, bc, enpassant, 0, 0, None, 0, board_phase(board_out), 0)
+    position = position._replace(hash=position.z_hash(), pawn_hash=position.pawn_z_hash())
     if player == 'w':
-        return Position(board_out, 0, wc, bc, enpassant, 0, 0, None)
+        return position
     else:
-        return Position(board_out, 0, wc, bc, enpassant, 0, 0, None).rotate()
+        return position.rotate()
+
+
+# board representations the search can run on, selected with the "board" AI setting
+# the immutable positions are stacked up so they offer the same make/unmake interface as SearchBoard
+board_types = {
+    'mutable': fen_to_search_board,
+    'mailbox': lambda fen: PositionStack(fen_to_position(fen)),
+    'bitboard': lambda fen: PositionStack(bitboard.fen_to_bitposition(fen))
+}
 
 
 class AI(BaseAI):
@@ -279,9 +519,51 @@ class AI(BaseAI):
         """ This is called once the game starts and your AI knows its playerID
         and game. You can initialize your AI here.
         """
-        # store a sign controlling addition or subtraction so pieces move in the right direction
-        self.board = fen_to_position(self.game.fen)
-        self.transposition_table = dict()
+        # pick the board representation, they all offer the same make/unmake API to the search
+        self.board_type = self.get_setting('board') or 'mutable'
+        self.board = board_types[self.board_type](self.game.fen)
+        # the number of game moves the board has made, it follows the game move by move from here on
+        self.synced_moves = len(self.game.moves)
+        # the "syncdebug" setting checks the board against the FEN after every move it follows
+        self.sync_debug = self.get_switch('syncdebug', False)
+        # the evaluation caches, sized in MB by the "evalcache" and "pawnhash" settings before any helper is started
+        eval_cache.resize(int(self.get_setting('evalcache') or EVAL_CACHE_MB))
+        pawn_hash.resize(int(self.get_setting('pawnhash') or PAWN_HASH_MB))
+        # the table lives for the whole game, so entries from earlier turns keep serving the search
+        # with more than one thread, helper processes search alongside the main search on a shared table
+        threads = int(self.get_setting('threads') or 1)
+        # endgame bitbases, from the "bitbases" directory setting or the endgames directory next to this file
+        # helpers and local workers open the same directory
+        bitbases = self.get_setting('bitbases') or default_directory
+        if threads > 1:
+            self.smp = LazySMP(threads, int(self.get_setting('hash') or 16), bitbases)
+            self.transposition_table = self.smp.tt
+        else:
+            self.smp = None
+            self.transposition_table = TranspositionTable(int(self.get_setting('hash') or 16))
+        # the "workers" setting splits the root moves over worker processes, a number starts that many locally
+        # and a comma separated list of host:port connects to workers already running
+        workers = self.get_setting('workers')
+        # a Polyglot opening book, from the "book" setting or book.bin next to this file
+        book = self.get_setting('book') or os.path.join(os.path.dirname(__file__), 'book.bin')
+        self.book = OpeningBook(book) if os.path.isfile(book) else None
+        # a file of deeply searched positions that outlives the game, from the "cache" setting
+        # the file is only mapped here, and read a page at a time as the search needs it
+        cache = self.get_setting('cache')
+        self.cache = PositionCache(cache, int(self.get_setting('cachesize') or 64),
+                                   board_salt(self.board_type)) if cache else None
+        self.bitbases = Bitbases(bitbases)
+        self.coordinator = Coordinator.from_setting(workers, int(self.get_setting('hash') or 16),
+                                                    bitbases) if workers else None
+        # search the expected reply on the opponent's time, off unless the "ponder" setting turns it on
+        self.pondering = self.get_switch('ponder', False)
+        self.ponderer = None
+        self.expected_reply = None
+        # the depth the last search completed, an exact table entry of the root at least that deep is played
+        # without searching again
+        # before the first search the only entries are those of the position cache, which earlier games stored
+        # once they had searched the position at least CACHE_DEPTH deep, so those are played as they are
+        self.reached_depth = CACHE_DEPTH if self.cache else MAX_PLY
 
     def game_updated(self):
         """ This is called every time the game's state updates, so if you are
@@ -290,6 +572,12 @@ class AI(BaseAI):
 
         # replace with your game updated logic
         self.update_board()
+        if self.ponderer and self.game.current_player == self.player:
+            # the opponent has moved, keep the ponder search if it guessed right
+            if self.board.hash == self.ponderer.hash:
+                self.ponderer.hit(self.new_clock())
+            else:
+                self.stop_pondering()
 
     def end(self, won, reason):
         """ This is called when the game ends, you can clean up your data and
@@ -300,8 +588,22 @@ class AI(BaseAI):
             reason (str): The human readable string explaining why you won or
                           lost.
         """
-        pass
-        # replace with your end logic
+        self.stop_pondering()
+        if self.cache:
+            # what this game learned goes to the cache for the next one, before a shared table is let go of
+            self.cache.merge(self.transposition_table)
+            self.cache.close()
+            self.cache = None
+        if self.smp:
+            self.smp.close()
+            self.smp = None
+        if self.coordinator:
+            self.coordinator.close()
+            self.coordinator = None
+        if self.book:
+            self.book.close()
+            self.book = None
+        self.bitbases.close()
 
     def run_turn(self):
         """ This is called every time it is this AI.player's turn.
@@ -332,15 +634,14 @@ class AI(BaseAI):
 
         # 4) make a move
         (piece_index, move_index) = self.tlabiddl_minimax()
-
-        # flip board indicies if playing from other side
-        if self.player.color == "Black":
-            piece_index = 119 - piece_index
-            move_index = 119 - move_index
-
-        # convert indices to SAN
-        piece_pos = square_san(piece_index)
-        move_pos = square_san(move_index)
+        print("Eval cache hits: {:.1%}, pawn hash hits: {:.1%}".format(eval_cache.hit_rate(), pawn_hash.hit_rate()))
+        if self.pondering:
+            self.ponder((piece_index, move_index))
+
+        # convert indices to SAN, the tables flip the indices of the mailbox Position when playing black
+        black = self.player.color == "Black"
+        piece_pos = game_square(self.board_type, piece_index, black)
+        move_pos = game_square(self.board_type, move_index, black)
         piece = self.get_game_piece(piece_pos.rank, piece_pos.file)
         piece.move(move_pos.file, move_pos.rank, promotionType="Queen")
 
@@ -348,107 +649,135 @@ class AI(BaseAI):
 
     def get_game_piece(self, rank, file):
         # used to go between rank and file notation and actual game object
-        return next((piece for piece in self.game.pieces if piece.rank == rank and piece.file == file), None)
+        return self.game.piece_at(file, rank)
 
     def update_board(self):
-        # update current board state by converting current FEN to Position object
-        self.board = fen_to_position(self.game.fen)
+        # advance the board by the moves the game has made since the last update, keeping its hash and history
+        # the FEN is only parsed when the board cannot follow a move, or to check it in debug mode
+        moves = self.game.moves
+        if len(moves) == self.synced_moves:
+            # a delta that did not change the board
+            return
+        if len(moves) != self.synced_moves + 1 or not self.make_game_move(moves[-1]):
+            self.board = board_types[self.board_type](self.game.fen)
+        self.synced_moves = len(moves)
+        if self.sync_debug:
+            parsed = board_types[self.board_type](self.game.fen)
+            if parsed.hash != self.board.hash:
+                print("Board out of sync after '{}', reloading the FEN".format(moves[-1].san))
+                self.board = parsed
+
+    def make_game_move(self, game_move):
+        # makes a Move of the game on the board, returns False if the board cannot make it
+        # the board only promotes to queens, any other promotion has to come from the FEN
+        if game_move.promotion and game_move.promotion != 'Queen':
+            return False
+        black = self.board.hash & SIDE_BIT
+        move = (board_square(self.board_type, game_move.from_file, game_move.from_rank, black),
+                board_square(self.board_type, game_move.to_file, game_move.to_rank, black))
+        if move not in self.board.gen_legal_moves():
+            return False
+        self.board.make_move(move)
+        return True
 
     def tlabiddl_minimax(self):
-        # Time Limited Alpha Beta Iterative-Deepening Depth-Limited MiniMax
-        initial_board = self.board
-        l_depth = 0
-        depth_limit = 4
-        # time limiting stuff
-        time_limit = 10  # 10 seconds to find the best move
-        start_time = timer()
-        # history stuff
-        history = defaultdict(dict)
-
-        if initial_board.z_hash() in self.transposition_table.keys():
-            return self.transposition_table[initial_board.z_hash()]
-
-        def min_play(board, alpha=(-inf), beta=(inf)):
-            if board.depth >= l_depth:
-                return board.value()
-            best_score = inf
-            for move in board.gen_moves():
-                next_board = board.move(move)
-                if next_board.is_check(): continue
-                if next_board.is_quiescent():
-                    score = quiescence(next_board, alpha, beta)
-                else:
-                    score = max_play(next_board, alpha, beta)
-                if score < best_score:
-                    best_move = move
-                    best_score = score
-                if score <= alpha:
-                    return score
-                beta = min(beta, score)
-            return best_score
-
-        def max_play(board, alpha=(-inf), beta=(inf)):
-            if board.depth >= l_depth:
-                return board.value()
-            best_score = -inf
-            for move in board.gen_moves():
-                next_board = board.move(move)
-                if next_board.is_check(): continue
-                if next_board.is_quiescent():
-                    score = quiescence(next_board, alpha, beta)
-                score = min_play(next_board, alpha, beta)
-                if score > best_score:
-                    best_move = move
-                    best_score = score
-                if score >= beta:
-                    return score
-                alpha = max(alpha, score)
-            return best_score
-
-        def quiescence(board, alpha=(-inf), beta=(inf)):
-            stand_pat = board.value()
-            if stand_pat >= beta:
-                return beta
-            if alpha < stand_pat:
-                alpha = stand_pat
-            for move in board.gen_moves():
-                if (timer() - start_time) >= time_limit:
-                    # if time limit has been reached, give us the best move
-                    return alpha
-                next_board = board.move(move)
-                score = -quiescence(next_board, -beta, -alpha)
-                if score >= beta:
-                    history[initial_board.z_hash()][board.z_hash()] = board.depth * board.depth
-                    return beta
-                if score > alpha:
-                    alpha = score
-            return alpha
-
-        while l_depth <= depth_limit:
-            frontier = [initial_board]
-            visited = [initial_board]
-            while len(frontier) != 0:
-                # sort frontier by prune history
-                frontier = sorted(frontier, key=lambda x: history[initial_board.z_hash()].get(x.z_hash(), 0))
-                board = frontier.pop(0)
-                best_score = -inf
-                for move in board.gen_moves():
-                    next_board = board.move(move)
-                    if next_board.is_check(): continue
-                    score = max_play(next_board)
-                    if score > best_score:
-                        best_move = move
-                        best_score = score
-                    if not (next_board in visited) and not (next_board in frontier):
-                        visited.append(next_board)
-                    if (timer() - start_time) >= time_limit:
-                        # if time limit has been reached, give us the best move
-                        self.transposition_table[self.board.board] = best_move
-                        return best_move
-            if len(frontier) == 0:
-                l_depth += 1
-        self.transposition_table[self.board.board] = best_move
-        return best_move
+        # Time Limited Alpha Beta Iterative-Deepening search of the current board, returns the move to play
+        self.expected_reply = None
+        move = self.book_move()
+        if move or (self.ponderer and self.ponderer.hash != self.board.hash):
+            # a ponder search of any other position is no use to us
+            self.stop_pondering()
+        if move:
+            return move
+        if self.ponderer:
+            # the opponent played as expected, the ponder search has been searching this position all along
+            self.ponderer.hit(self.new_clock())
+            searcher = self.ponderer.searcher
+            move = self.ponderer.result()
+            self.ponderer = None
+        else:
+            tt = self.transposition_table
+            entry = tt.probe(self.board.hash)
+            if not entry and self.cache:
+                entry = self.cache.probe(self.board.hash)
+                if entry:
+                    tt.store(self.board.hash, *entry)
+            # the root entry has to be as deep as the "depth" setting, or without one as deep as the last search got
+            trust_depth = int(self.get_setting('depth') or self.reached_depth)
+            if entry and entry[2] == EXACT and entry[0] >= trust_depth and entry[3]:
+                return entry[3]
+            if self.coordinator:
+                move = self.coordinator.search(self.board, self.game.fen, self.board_type, self.search_options(),
+                                               self.new_clock(), tt)
+                self.reached_depth = self.coordinator.depth or self.reached_depth
+                return move
+            searcher = self.new_searcher(self.board, self.new_clock())
+            move = self.smp.search(searcher, self.search_options()) if self.smp else searcher.iterate()
+        # a forced move is not searched, and leaves the depth as it was
+        self.reached_depth = searcher.depth or self.reached_depth
+        pv = searcher.principal_variation()
+        self.expected_reply = pv[1] if len(pv) > 1 else None
+        return move
+
+    def book_move(self):
+        # a move from the opening book for the current position, in the squares of the board, or None
+        if not self.book:
+            return None
+        found = self.book.choose(polyglot_key(self.game.fen))
+        if not found:
+            return None
+        black = self.player.color == "Black"
+        for move in self.board.gen_legal_moves():
+            squares = book_square(self.board_type, move[0], black), book_square(self.board_type, move[1], black)
+            if squares == found[:2] or (squares == book_castling.get(found[:2]) and
+                                        self.board.move_pieces(move)[0] == 'K'):
+                return move
+        return None
+
+    def new_searcher(self, board, clock):
+        return Searcher(board, self.transposition_table, clock=clock, cache=self.cache, bitbases=self.bitbases,
+                        **self.search_options())
+
+    def search_options(self):
+        # the search settings, the selective search techniques can each be switched off to compare
+        return dict(depth_limit=int(self.get_setting('depth') or MAX_PLY), null_move=self.get_switch('nullmove'),
+                    lmr=self.get_switch('lmr'), reverse_futility=self.get_switch('rfp'),
+                    futility=self.get_switch('futility'))
+
+    def new_clock(self):
+        # the "time" setting gives every move a fixed number of seconds, otherwise the clock is budgeted
+        if self.get_setting('time'):
+            seconds = float(self.get_setting('time'))
+            return TimeManager(seconds, seconds)
+        return TimeManager.from_clock(self.player.time_remaining, self.game.current_turn, self.game.max_turns)
+
+    def ponder(self, move):
+        # starts searching the position after our move and the reply we expect to it
+        # the ponder search gets a board of its own, as this one goes on following the game
+        self.stop_pondering()
+        board = board_types[self.board_type](self.game.fen)
+        board.make_move(move)
+        reply = self.expected_reply
+        if not reply:
+            entry = self.transposition_table.probe(board.hash)
+            reply = entry and entry[3]
+        if not reply or reply not in board.gen_legal_moves():
+            return
+        board.make_move(reply)
+        self.ponderer = Ponderer(self.new_searcher(board, TimeManager.unlimited()))
+
+    def stop_pondering(self):
+        # stops the ponder search, if there is one, and throws it away
+        if self.ponderer:
+            self.ponderer.cancel()
+            self.ponderer = None
+
+    def get_switch(self, key, default=True):
+        # an on/off AI setting, turned off by 0, false, off or no
+        value = self.get_setting(key)
+        if value is None:
+            return default
+        return value.lower() not in ('0', 'false', 'off', 'no')
 
     def print_current_board(self):
         """Prints the current board using pretty ASCII art
@@ -470,12 +799,7 @@ class AI(BaseAI):
                 for file_offset in range(0, 8):
                     # start at a, with with file offset increasing the char
                     f = chr(ord("a") + file_offset)
-                    current_piece = None
-                    for piece in self.game.pieces:
-                        if piece.file == f and piece.rank == r:
-                            # then we found the piece at (file, rank)
-                            current_piece = piece
-                            break
+                    current_piece = self.game.piece_at(f, r)
 
                     code = "."  # default "no piece"
                     if current_piece:
@@ -0,0 +1,69 @@
+import argparse
+from timeit import default_timer as timer
+from games.chess.ai import board_types
+from games.chess.search import Searcher
+from games.chess.smp import LazySMP
+from games.chess.time_manager import TimeManager
+from games.chess.transposition import TranspositionTable
+
+'''
+Search benchmark
+Searches a fixed set of positions to a fixed depth, once for every number of threads up to the one given,
+and reports the time taken, the nodes searched by all processes and the speedup over a single thread
+Lazy SMP does not split the work, so its gain shows as a shorter time to reach the depth
+
+    python3 -m games.chess.bench --threads 4 --depth 7
+'''
+
+positions = [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    'r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4',
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    '6k1/5ppp/8/8/3n4/8/5PPP/2R3K1 b - - 0 1',
+]
+
+
+def bench(threads, depth, board_type='mutable', size_mb=16):
+    # returns the seconds and the nodes it takes to search every position to the depth
+    smp = LazySMP(threads, size_mb) if threads > 1 else None
+    seconds = nodes = 0
+    try:
+        for fen in positions:
+            tt = smp.tt if smp else TranspositionTable(size_mb)
+            tt.clear()
+            options = dict(depth_limit=depth)
+            searcher = Searcher(board_types[board_type](fen), tt, clock=TimeManager.unlimited(), **options)
+            start = timer()
+            if smp:
+                smp.search(searcher, options)
+                nodes += smp.nodes
+            else:
+                searcher.iterate()
+                nodes += searcher.nodes
+            seconds += timer() - start
+    finally:
+        if smp:
+            smp.close()
+    return seconds, nodes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Times the search with an increasing number of threads.')
+    parser.add_argument('--threads', type=int, default=4, help='the most threads to search with')
+    parser.add_argument('--depth', type=int, default=6, help='the depth to search every position to')
+    parser.add_argument('--board', default='mutable', choices=sorted(board_types), help='the board representation')
+    parser.add_argument('--hash', type=int, default=16, help='the size of the transposition table in MB')
+    args = parser.parse_args()
+
+    base = None
+    threads = 1
+    while True:
+        seconds, nodes = bench(threads, args.depth, args.board, args.hash)
+        base = base or seconds
+        print('threads {:3}  time {:8.2f}s  nodes {:10}  nps {:8.0f}  speedup {:5.2f}'.format(
+            threads, seconds, nodes, nodes / seconds, base / seconds))
+        if threads >= args.threads:
+            break
+        threads = min(threads * 2, args.threads)
@@ -0,0 +1,272 @@
+import mmap
+import os
+from array import array
+from collections import deque
+
+'''
+Endgame bitbases
+Win/draw tables for king and pawn, rook or queen against a lone king, made offline by retrograde analysis
+and probed by the search: a known draw ends the search of its subtree with the exact score, a known win is still
+searched so the mate can be found, and scores as a win at the leaves, with a bonus for progress towards the mate
+
+A table holds one bit per position, set when the side with the extra piece wins, indexed by
+    ((side to move * 64 + strong king) * 64 + strong piece) * 64 + weak king
+with squares numbered a1 = 0, the side to move 0 for the strong side and 1 for the weak side
+The weak side can never win these endings, so a clear bit is a draw, and a set bit a loss when the weak side moves
+Tables are stored with white as the strong side, a position where black is stronger is mirrored first
+
+Generation starts from the mates, and from the promotions that reach a won KQK or KRK position, and walks back:
+a position with the strong side to move is won once one move leads to a won position,
+one with the weak side to move once every move does, which is kept track of by counting down its moves
+
+The tables are written by games.chess.build_bitbases
+'''
+
+# the score of a known win, below any mate score, with room on top for progress towards the mate
+KNOWN_WIN = 20000
+TABLE_SIZE = 2 * 64 * 64 * 64
+endgames = ('kqk', 'krk', 'kpk')
+default_directory = os.path.join(os.path.dirname(__file__), 'endgames')
+
+
+def index(stm, strong_king, piece, weak_king):
+    return ((stm * 64 + strong_king) * 64 + piece) * 64 + weak_king
+
+
+def _steps(sq, steps):
+    f, r = sq % 8, sq // 8
+    return [(r + dr) * 8 + f + df for df, dr in steps if 0 <= f + df < 8 and 0 <= r + dr < 8]
+
+
+def _rays(sq, directions):
+    rays = []
+    f, r = sq % 8, sq // 8
+    for df, dr in directions:
+        ray = []
+        nf, nr = f + df, r + dr
+        while 0 <= nf < 8 and 0 <= nr < 8:
+            ray.append(nr * 8 + nf)
+            nf, nr = nf + df, nr + dr
+        rays.append(ray)
+    return rays
+
+
+king_steps = [_steps(sq, [(df, dr) for df in (-1, 0, 1) for dr in (-1, 0, 1) if df or dr]) for sq in range(64)]
+adjacent = [set(steps) for steps in king_steps]
+piece_rays = {
+    'r': [_rays(sq, ((1, 0), (-1, 0), (0, 1), (0, -1))) for sq in range(64)],
+    'q': [_rays(sq, ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))) for sq in range(64)],
+}
+# the squares a white pawn attacks
+pawn_attacks = [_steps(sq, ((-1, 1), (1, 1))) if sq < 56 else [] for sq in range(64)]
+
+
+def attacks(kind, piece, target, blocker):
+    # returns if the strong piece attacks the target square, with one other square blocking rays
+    if kind == 'p':
+        return target in pawn_attacks[piece]
+    for ray in piece_rays[kind][piece]:
+        for sq in ray:
+            if sq == target:
+                return True
+            if sq == blocker:
+                break
+    return False
+
+
+def legal(kind, strong_king, piece, weak_king, stm):
+    # returns if the position can come up in a game
+    if len({strong_king, piece, weak_king}) < 3 or weak_king in adjacent[strong_king]:
+        return False
+    if kind == 'p' and not 8 <= piece < 56:
+        return False
+    # the side not to move cannot be in check, only the weak king can be
+    return stm or not attacks(kind, piece, weak_king, strong_king)
+
+
+def piece_moves(kind, piece, strong_king, weak_king):
+    # the squares the strong piece can move to without capturing, promotions excluded
+    if kind == 'p':
+        targets = []
+        if piece + 8 < 56 and piece + 8 not in (strong_king, weak_king):
+            targets.append(piece + 8)
+            if piece < 16 and piece + 16 not in (strong_king, weak_king):
+                targets.append(piece + 16)
+        return targets
+    targets = []
+    for ray in piece_rays[kind][piece]:
+        for sq in ray:
+            if sq in (strong_king, weak_king):
+                break
+            targets.append(sq)
+    return targets
+
+
+def piece_unmoves(kind, piece, strong_king, weak_king):
+    # the squares the strong piece can have come from
+    if kind == 'p':
+        sources = []
+        if piece - 8 >= 8 and piece - 8 not in (strong_king, weak_king):
+            sources.append(piece - 8)
+            if 24 <= piece < 32 and piece - 16 not in (strong_king, weak_king):
+                sources.append(piece - 16)
+        return sources
+    # rook and queen moves are their own reverse
+    return piece_moves(kind, piece, strong_king, weak_king)
+
+
+def generate(kind, promotions=None):
+    # the win bits of the ending of a king and piece kind ('p', 'r' or 'q') against a king
+    # promotions -- for kpk, the kqk and krk tables the pawn can promote into
+    won = bytearray(TABLE_SIZE)
+    moves_left = array('b', bytes(TABLE_SIZE))
+    queue = deque()
+
+    for sk in range(64):
+        for p in range(64):
+            for wk in range(64):
+                # the weak side to move, count its moves, mates are won already
+                if legal(kind, sk, p, wk, 1):
+                    count = 0
+                    for to in king_steps[wk]:
+                        if to == sk or to in adjacent[sk]:
+                            continue
+                        # the king is lifted off its square, so it cannot hide behind itself from a ray
+                        if to != p and attacks(kind, p, to, sk):
+                            continue
+                        if to == p and p in adjacent[sk]:
+                            continue
+                        count += 1
+                    i = index(1, sk, p, wk)
+                    moves_left[i] = count
+                    if not count and attacks(kind, p, wk, sk):
+                        won[i] = 1
+                        queue.append(i)
+                # the strong side to move, a pawn that promotes into a won position has won
+                if promotions and 48 <= p < 56 and legal(kind, sk, p, wk, 0) and p + 8 not in (sk, wk):
+                    for table in promotions:
+                        if table[index(1, sk, p + 8, wk)]:
+                            i = index(0, sk, p, wk)
+                            if not won[i]:
+                                won[i] = 1
+                                queue.append(i)
+                            break
+
+    while queue:
+        i = queue.popleft()
+        wk, p, sk, stm = i % 64, i // 64 % 64, i // 4096 % 64, i // 262144
+        if stm:
+            # the strong side moved into this won position, from any square its king or piece came from
+            for from_king in king_steps[sk]:
+                if from_king in (p, wk) or from_king in adjacent[wk]:
+                    continue
+                if legal(kind, from_king, p, wk, 0):
+                    j = index(0, from_king, p, wk)
+                    if not won[j]:
+                        won[j] = 1
+                        queue.append(j)
+            for from_piece in piece_unmoves(kind, p, sk, wk):
+                if legal(kind, sk, from_piece, wk, 0):
+                    j = index(0, sk, from_piece, wk)
+                    if not won[j]:
+                        won[j] = 1
+                        queue.append(j)
+        else:
+            # the weak king moved into this won position, one move less to escape from where it came from
+            for from_king in king_steps[wk]:
+                if from_king in (sk, p) or from_king in adjacent[sk]:
+                    continue
+                j = index(1, sk, p, from_king)
+                if not won[j] and legal(kind, sk, p, from_king, 1):
+                    moves_left[j] -= 1
+                    if not moves_left[j]:
+                        won[j] = 1
+                        queue.append(j)
+    return won
+
+
+def pack(won):
+    # eight positions to a byte, the lowest bit first
+    packed = bytearray(len(won) // 8)
+    for i in range(0, len(won), 8):
+        byte = 0
+        for bit in range(8):
+            if won[i + bit]:
+                byte |= 1 << bit
+        packed[i // 8] = byte
+    return bytes(packed)
+
+
+class PackedTable:
+    """ A memory mapped bitbase, read a bit at a time
+    path -- the .bin file
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __getitem__(self, i):
+        return self.map[i >> 3] >> (i & 7) & 1
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+class Bitbases:
+    """ The bitbases found in a directory, probed by the search
+    tables -- piece kind ('p', 'r' or 'q') -> the table of that ending
+    hits -- the number of probes a table answered
+    """
+
+    def __init__(self, directory=default_directory):
+        self.tables = {}
+        for name in endgames:
+            path = os.path.join(directory, name + '.bin')
+            if os.path.isfile(path):
+                self.tables[name[1]] = PackedTable(path)
+        self.hits = 0
+
+    def probe(self, board, black_to_move):
+        # the exact score of the position for the side to move, or None when no table knows it
+        pieces = board.piece_list(3)
+        if pieces is None:
+            return None
+        if len(pieces) == 2:
+            # bare kings
+            self.hits += 1
+            return 0
+        strong = [(p, sq) for p, sq in pieces if p not in 'Kk']
+        if len(strong) != 1 or strong[0][0].lower() not in self.tables:
+            return None
+        p, piece = strong[0]
+        black_strong = p.islower()
+        kings = dict((p, sq) for p, sq in pieces if p in 'Kk')
+        strong_king, weak_king = (kings['k'], kings['K']) if black_strong else (kings['K'], kings['k'])
+        if black_strong:
+            # mirror the ranks, so the strong side is white as in the tables
+            strong_king, piece, weak_king = strong_king ^ 56, piece ^ 56, weak_king ^ 56
+        stm = int(black_to_move != black_strong)
+        self.hits += 1
+        if not self.tables[p.lower()][index(stm, strong_king, piece, weak_king)]:
+            return 0
+        score = KNOWN_WIN + progress(p.lower(), strong_king, piece, weak_king)
+        return -score if stm else score
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+
+
+def progress(kind, strong_king, piece, weak_king):
+    # how far a won position has come towards the mate, so the search makes headway instead of shuffling
+    if kind == 'p':
+        # push the pawn
+        return 20 * (piece // 8)
+    # drive the weak king away from the centre, and the strong king after it
+    f, r = weak_king % 8, weak_king // 8
+    centre = max(3 - f, f - 4) + max(3 - r, r - 4)
+    distance = abs(f - strong_king % 8) + abs(r - strong_king // 8)
+    return 10 * centre + 4 * (14 - distance)
+
@@ -0,0 +1,617 @@
+from collections import namedtuple
+from games.chess import zobrist
+from games.chess.evaluation import pst, phase_weights, piece_values
+from games.chess.eval_cache import evaluate
+
+'''
+Bitboard board representation
+Each piece type of each color is stored as a 64-bit integer, with bit n set when that piece occupies square n
+Squares are numbered absolutely from a1 = 0 to h8 = 63, so unlike the mailbox Position the board is never rotated
+Instead, the side to move is tracked explicitly, and move generation reads its masks from precomputed attack tables
+Sliders look their attacks up by the occupancy of each line through their square
+It searches faster than the mailbox Position, but the search spends most of its time outside move generation,
+so the mutable SearchBoard is still the fastest board and stays the default
+'''
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+# piece codes in board order: white pieces at 0 - 5, black pieces at 6 - 11
+piece_codes = 'PNBRQKpnbrqk'
+
+phase_values = tuple(phase_weights[p.upper()] for p in piece_codes)
+
+FULL = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_3 = RANK_1 << 16
+RANK_6 = RANK_1 << 40
+RANK_8 = RANK_1 << 56
+
+# castling rights bits
+WHITE_KING_SIDE, WHITE_QUEEN_SIDE, BLACK_KING_SIDE, BLACK_QUEEN_SIDE = 1, 2, 4, 8
+
+
+def _on_board(f, r):
+    return 0 <= f < 8 and 0 <= r < 8
+
+
+def _step_table(steps):
+    # for each square, the mask of squares reachable with a single step
+    table = []
+    for sq in range(64):
+        f, r = sq % 8, sq // 8
+        mask = 0
+        for df, dr in steps:
+            if _on_board(f + df, r + dr):
+                mask |= 1 << (f + df + 8 * (r + dr))
+        table.append(mask)
+    return table
+
+
+def _ray_table(df, dr):
+    # for each square, the mask of squares along a ray, not including the square itself
+    table = []
+    for sq in range(64):
+        f, r = sq % 8 + df, sq // 8 + dr
+        mask = 0
+        while _on_board(f, r):
+            mask |= 1 << (f + 8 * r)
+            f, r = f + df, r + dr
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _step_table(((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)))
+KING_ATTACKS = _step_table(((0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)))
+# squares attacked by a pawn of the given color standing on a square
+PAWN_ATTACKS = (_step_table(((-1, 1), (1, 1))), _step_table(((-1, -1), (1, -1))))
+
+# rays as (table, forward) pairs, forward rays run towards higher square numbers
+BISHOP_RAYS = ((_ray_table(1, 1), True), (_ray_table(-1, 1), True),
+               (_ray_table(1, -1), False), (_ray_table(-1, -1), False))
+ROOK_RAYS = ((_ray_table(0, 1), True), (_ray_table(1, 0), True),
+             (_ray_table(0, -1), False), (_ray_table(-1, 0), False))
+
+# castling rights that survive a move touching a square
+castling_masks = [0xF] * 64
+castling_masks[4] &= ~(WHITE_KING_SIDE | WHITE_QUEEN_SIDE)
+castling_masks[7] &= ~WHITE_KING_SIDE
+castling_masks[0] &= ~WHITE_QUEEN_SIDE
+castling_masks[60] &= ~(BLACK_KING_SIDE | BLACK_QUEEN_SIDE)
+castling_masks[63] &= ~BLACK_KING_SIDE
+castling_masks[56] &= ~BLACK_QUEEN_SIDE
+
+
+def mailbox_index(sq):
+    # the mailbox (Position) index of a square, as seen by white
+    return zobrist.A1 + sq % 8 - 10 * (sq // 8)
+
+
+# Zobrist keys, borrowed from the mailbox layout so both representations hash a position the same way
+z_table = [[zobrist.piece_keys[p][mailbox_index(sq)] for sq in range(64)] for p in piece_codes]
+z_ep = [zobrist.ep_keys[mailbox_index(sq)] if sq else 0 for sq in range(64)]
+# packed piece-square scores from white's point of view, borrowed from the mailbox tables like the keys
+pst_table = [[pst[p][mailbox_index(sq)] for sq in range(64)] for p in piece_codes]
+z_castling = zobrist.side_castling_keys
+# exchange values by board index
+see_values = [piece_values[p.upper()] for p in piece_codes]
+
+
+def _nearest(blockers, forward):
+    # the nearest blocker is the lowest bit on forward rays and the highest bit otherwise
+    if forward:
+        return (blockers & -blockers).bit_length() - 1
+    return blockers.bit_length() - 1
+
+
+def _slider_attacks(sq, occupied, rays):
+    attacks = 0
+    for ray, forward in rays:
+        mask = ray[sq]
+        blockers = mask & occupied
+        if blockers:
+            mask ^= ray[_nearest(blockers, forward)]
+        attacks |= mask
+    return attacks
+
+
+def _line_table(rays):
+    # for each square, the mask of a line through it and the attacks along that line for every occupancy of it,
+    # so a slider looks its attacks up instead of walking its rays
+    masks, tables = [], []
+    for sq in range(64):
+        mask = rays[0][0][sq] | rays[1][0][sq]
+        table = {}
+        # visit every subset of the mask
+        occupied = 0
+        while True:
+            table[occupied] = _slider_attacks(sq, occupied, rays)
+            occupied = (occupied - mask) & mask
+            if not occupied: break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+DIAGONAL_MASKS, DIAGONAL_ATTACKS = _line_table((BISHOP_RAYS[0], BISHOP_RAYS[3]))
+ANTI_DIAGONAL_MASKS, ANTI_DIAGONAL_ATTACKS = _line_table((BISHOP_RAYS[1], BISHOP_RAYS[2]))
+FILE_MASKS, FILE_ATTACKS = _line_table((ROOK_RAYS[0], ROOK_RAYS[2]))
+RANK_MASKS, RANK_ATTACKS = _line_table((ROOK_RAYS[1], ROOK_RAYS[3]))
+
+
+def bishop_attacks(sq, occupied):
+    return DIAGONAL_ATTACKS[sq][occupied & DIAGONAL_MASKS[sq]] | \
+        ANTI_DIAGONAL_ATTACKS[sq][occupied & ANTI_DIAGONAL_MASKS[sq]]
+
+
+def rook_attacks(sq, occupied):
+    return FILE_ATTACKS[sq][occupied & FILE_MASKS[sq]] | RANK_ATTACKS[sq][occupied & RANK_MASKS[sq]]
+
+
+def squares(bb):
+    # yields the index of every set bit
+    while bb:
+        b = bb & -bb
+        yield b.bit_length() - 1
+        bb ^= b
+
+
+class BitPosition(namedtuple('BitPosition', 'board occupancy side castling ep score depth captured hash phase '
+                                            'pawn_hash')):
+    """ A state of a chess game, stored as bitboards
+    board -- a tuple of 12 bitboards, indexed as piece_codes
+    occupancy -- a tuple of the white and black occupancy masks
+    side -- the color to move, WHITE or BLACK
+    castling -- the castling rights, as a mask of the *_SIDE bits
+    ep -- the en passant square
+    score -- the packed piece-square-table evaluation for the side to move, kept up to date by move
+    depth -- the node depth of the position
+    captured -- the piece that was captured as the result of the last move
+    hash -- the 64-bit Zobrist hash, kept up to date by move, rotate and nullmove
+    phase -- the game phase, from 24 with all pieces on the board down to 0 with only kings and pawns
+    pawn_hash -- the Zobrist key of the pawns alone, for the pawn hash
+    """
+
+    def gen_moves(self, tactical=True, quiet=True):
+        # tactical - generate captures and promotions
+        # quiet - generate every other move
+        us = self.side
+        them = us ^ 1
+        base = 6 * us
+        board = self.board
+        own, other = self.occupancy[us], self.occupancy[them]
+        occupied = own | other
+        empty = ~occupied & FULL
+        targets = (other if tactical else 0) | (empty if quiet else 0)
+        # Pawn move, double move and capture
+        pawns = board[base + PAWN]
+        capturable = other | (1 << self.ep if self.ep else 0)
+        if us == WHITE:
+            single = (pawns << 8) & empty
+            double = ((single & RANK_3) << 8) & empty
+            west = (pawns << 7) & ~FILE_H & capturable
+            east = (pawns << 9) & ~FILE_A & capturable
+            forward = 8
+        else:
+            single = (pawns >> 8) & empty
+            double = ((single & RANK_6) >> 8) & empty
+            west = (pawns >> 9) & ~FILE_H & capturable
+            east = (pawns >> 7) & ~FILE_A & capturable
+            forward = -8
+        # pushes onto the last rank are promotions, and count as tactical moves
+        if not tactical:
+            single &= ~(RANK_1 | RANK_8)
+            west = east = 0
+        if not quiet:
+            single &= RANK_1 | RANK_8
+            double = 0
+        for j in squares(west):
+            yield (j - forward + 1, j)
+        for j in squares(east):
+            yield (j - forward - 1, j)
+        for j in squares(single):
+            yield (j - forward, j)
+        for j in squares(double):
+            yield (j - 2 * forward, j)
+        # Knights and king step through their attack tables
+        for i in squares(board[base + KNIGHT]):
+            for j in squares(KNIGHT_ATTACKS[i] & targets):
+                yield (i, j)
+        # Sliders stop on the first blocker in each ray
+        for i in squares(board[base + BISHOP] | board[base + QUEEN]):
+            for j in squares(bishop_attacks(i, occupied) & targets):
+                yield (i, j)
+        for i in squares(board[base + ROOK] | board[base + QUEEN]):
+            for j in squares(rook_attacks(i, occupied) & targets):
+                yield (i, j)
+        for i in squares(board[base + KING]):
+            for j in squares(KING_ATTACKS[i] & targets):
+                yield (i, j)
+            if not quiet: continue
+            # Castling, the king may not leave, cross or land on an attacked square
+            if us == WHITE:
+                king_side, queen_side = WHITE_KING_SIDE, WHITE_QUEEN_SIDE
+            else:
+                king_side, queen_side = BLACK_KING_SIDE, BLACK_QUEEN_SIDE
+            if self.castling & king_side and not occupied & (0b11 << (i + 1)) \
+                    and not any(self.is_attacked(k, them) for k in (i, i + 1, i + 2)):
+                yield (i, i + 2)
+            if self.castling & queen_side and not occupied & (0b111 << (i - 3)) \
+                    and not any(self.is_attacked(k, them) for k in (i, i - 1, i - 2)):
+                yield (i, i - 2)
+
+    def pins_and_checks(self):
+        # looks outward from our king once, returning
+        # checkers - the pieces giving check
+        # evasions - the squares a piece other than the king can move to while in a single check
+        # pins - pinned square -> the squares that piece may move to without uncovering the king
+        us = self.side
+        board = self.board
+        base = 6 * (us ^ 1)
+        king_bit = board[6 * us + KING]
+        if not king_bit:
+            return 0, 0, {}
+        king = king_bit.bit_length() - 1
+        own = self.occupancy[us]
+        occupied = own | self.occupancy[us ^ 1]
+        checkers = KNIGHT_ATTACKS[king] & board[base + KNIGHT] | PAWN_ATTACKS[us][king] & board[base + PAWN]
+        evasions = checkers
+        pins = {}
+        for rays, sliders in ((BISHOP_RAYS, board[base + BISHOP] | board[base + QUEEN]),
+                              (ROOK_RAYS, board[base + ROOK] | board[base + QUEEN])):
+            for ray, forward in rays:
+                mask = ray[king]
+                blockers = mask & occupied
+                if not blockers: continue
+                b = _nearest(blockers, forward)
+                if sliders >> b & 1:
+                    checkers |= 1 << b
+                    evasions |= mask ^ ray[b]
+                elif own >> b & 1 and blockers ^ (1 << b):
+                    # the first of our pieces on the ray is pinned if the next piece is their slider
+                    c = _nearest(blockers ^ (1 << b), forward)
+                    if sliders >> c & 1:
+                        pins[b] = mask ^ ray[c]
+        return checkers, evasions, pins
+
+    def gen_legal_moves(self, tactical=True, quiet=True, checks=None):
+        # the pseudo-legal moves, filtered by the checks and pins of our king, so no move has to be made to be tested
+        # checks - the result of pins_and_checks, when the caller generates the moves in several batches
+        us = self.side
+        them = us ^ 1
+        board = self.board
+        king_bit = board[6 * us + KING]
+        if not king_bit:
+            yield from self.gen_moves(tactical, quiet)
+            return
+        king = king_bit.bit_length() - 1
+        occupied = self.occupancy[us] | self.occupancy[them]
+        checkers, evasions, pins = checks or self.pins_and_checks()
+        double_check = checkers & (checkers - 1)
+        for move in self.gen_moves(tactical, quiet):
+            i, j = move
+            if i == king:
+                # castling has been checked against attacks already, other king moves are tested
+                # with the king lifted off the board so it cannot hide from a slider behind itself
+                if abs(j - i) == 2 or not self.is_attacked(j, them, occupied ^ king_bit): yield move
+                continue
+            if double_check: continue
+            if self.ep and j == self.ep and board[6 * us + PAWN] >> i & 1:
+                # en passant takes two pieces off one rank, so test the position it leads to
+                if not self.move(move).is_attacked(king, them): yield move
+                continue
+            if checkers and not evasions >> j & 1: continue
+            if i in pins and not pins[i] >> j & 1: continue
+            yield move
+
+    def is_legal_quiet(self, move, checks):
+        # returns if a move from elsewhere in the tree, such as a killer, is a legal quiet move here,
+        # without generating the moves of the position
+        # checks - the result of pins_and_checks
+        i, j = move
+        us = self.side
+        board = self.board
+        occupied = self.occupancy[us] | self.occupancy[us ^ 1]
+        if occupied >> j & 1 or not self.occupancy[us] >> i & 1:
+            return False
+        kind = self.piece_at(i) - 6 * us
+        if kind == PAWN:
+            forward = 8 if us == WHITE else -8
+            if j == i + forward:
+                if j < 8 or j >= 56: return False
+            elif j != i + 2 * forward or i // 8 != (1 if us == WHITE else 6) or occupied >> (i + forward) & 1:
+                return False
+        elif kind == KNIGHT:
+            if not KNIGHT_ATTACKS[i] >> j & 1: return False
+        elif kind == KING:
+            # castling is left to the quiet moves of the position
+            if not KING_ATTACKS[i] >> j & 1: return False
+        else:
+            attacks = 0
+            if kind != ROOK: attacks |= bishop_attacks(i, occupied)
+            if kind != BISHOP: attacks |= rook_attacks(i, occupied)
+            if not attacks >> j & 1: return False
+        king_bit = board[6 * us + KING]
+        if not king_bit:
+            return True
+        checkers, evasions, pins = checks
+        if kind == KING:
+            return not self.is_attacked(j, us ^ 1, occupied ^ king_bit)
+        if checkers & (checkers - 1) or checkers and not evasions >> j & 1: return False
+        return i not in pins or bool(pins[i] >> j & 1)
+
+    def rotate(self):
+        # Passes the move to the other side, preserving enpassant
+        h = self.hash ^ zobrist.black_key ^ z_castling[0][self.castling] ^ z_castling[1][self.castling]
+        return BitPosition(self.board, self.occupancy, self.side ^ 1, self.castling,
+                           self.ep, -self.score, self.depth, None, h, self.phase, self.pawn_hash)
+
+    def nullmove(self):
+        # Like rotate, but clears ep
+        h = self.hash ^ zobrist.black_key ^ z_castling[0][self.castling] ^ z_castling[1][self.castling]
+        return BitPosition(self.board, self.occupancy, self.side ^ 1, self.castling,
+                           0, -self.score, self.depth + 1, None, h ^ z_ep[self.ep], self.phase, self.pawn_hash)
+
+    def move(self, move):
+        # i - original square
+        # j - final square
+        i, j = move
+        us = self.side
+        them = us ^ 1
+        base = 6 * us
+        board = list(self.board)
+        occupancy = list(self.occupancy)
+        from_bit, to_bit = 1 << i, 1 << j
+        # h - hash with the old side, ep square and castling rights removed
+        h = self.hash ^ z_ep[self.ep] ^ z_castling[us][self.castling]
+        # score - the evaluation from white's point of view while the move is made
+        score = -self.score if us else self.score
+        phase = self.phase
+        # ph - the pawn key, changed by pawns moving, promoting or being taken
+        ph = self.pawn_hash
+        # p - board index of the moving piece
+        p = base
+        while not board[p] & from_bit:
+            p += 1
+        # q - board index of the captured piece, if any
+        q = None
+        if occupancy[them] & to_bit:
+            q = 6 * them
+            while not board[q] & to_bit:
+                q += 1
+            board[q] ^= to_bit
+            occupancy[them] ^= to_bit
+            h ^= z_table[q][j]
+            score -= pst_table[q][j]
+            phase -= phase_values[q]
+            if q == 6 * them + PAWN:
+                ph ^= z_table[q][j]
+        # perform the move
+        board[p] ^= from_bit | to_bit
+        occupancy[us] ^= from_bit | to_bit
+        h ^= z_table[p][i] ^ z_table[p][j]
+        score += pst_table[p][j] - pst_table[p][i]
+        ep = 0
+        if p == base + PAWN:
+            ph ^= z_table[p][i] ^ z_table[p][j]
+            if self.ep and j == self.ep:
+                # en passant capture removes the pawn behind the target square
+                q = 6 * them + PAWN
+                k = j - 8 if us == WHITE else j + 8
+                board[q] ^= 1 << k
+                occupancy[them] ^= 1 << k
+                h ^= z_table[q][k]
+                ph ^= z_table[q][k]
+                score -= pst_table[q][k]
+            elif abs(j - i) == 16:
+                ep = (i + j) // 2
+            elif to_bit & (RANK_1 | RANK_8):
+                # Promote the pawn to Queen
+                board[p] ^= to_bit
+                board[base + QUEEN] |= to_bit
+                h ^= z_table[p][j] ^ z_table[base + QUEEN][j]
+                ph ^= z_table[p][j]
+                score += pst_table[base + QUEEN][j] - pst_table[p][j]
+                phase += phase_values[base + QUEEN]
+        elif p == base + KING and abs(j - i) == 2:
+            # Castling Logic, the rook jumps over the king
+            r, k = (i + 3, i + 1) if j > i else (i - 4, i - 1)
+            board[base + ROOK] ^= 1 << r | 1 << k
+            occupancy[us] ^= 1 << r | 1 << k
+            h ^= z_table[base + ROOK][r] ^ z_table[base + ROOK][k]
+            score += pst_table[base + ROOK][k] - pst_table[base + ROOK][r]
+        castling = self.castling & castling_masks[i] & castling_masks[j]
+        h ^= zobrist.black_key ^ z_ep[ep] ^ z_castling[them][castling]
+        captured = None if q is None else piece_codes[q].upper()
+        return BitPosition(tuple(board), tuple(occupancy), them, castling, ep,
+                           -score if them else score, self.depth + 1, captured, h, phase, ph)
+
+    def value(self):
+        # the tapered evaluation, blended from the incrementally kept score, pawn structure included
+        return evaluate(self, -self.score if self.side else self.score, self.side)
+
+    def pawn_masks(self):
+        return self.board[PAWN], self.board[6 + PAWN]
+
+    def king_squares(self):
+        # the squares of the white and the black king, or -1 for a missing king
+        return self.board[KING].bit_length() - 1, self.board[6 + KING].bit_length() - 1
+
+    def is_attacked(self, sq, by, occupied=None):
+        # returns if the square is attacked by any piece of the given color, optionally with other occupied squares
+        board = self.board
+        base = 6 * by
+        if KNIGHT_ATTACKS[sq] & board[base + KNIGHT]: return True
+        if KING_ATTACKS[sq] & board[base + KING]: return True
+        if PAWN_ATTACKS[by ^ 1][sq] & board[base + PAWN]: return True
+        if occupied is None:
+            occupied = self.occupancy[0] | self.occupancy[1]
+        if bishop_attacks(sq, occupied) & (board[base + BISHOP] | board[base + QUEEN]): return True
+        if rook_attacks(sq, occupied) & (board[base + ROOK] | board[base + QUEEN]): return True
+        return False
+
+    def piece_at(self, sq):
+        # the board index of the piece on the square, or None
+        bit = 1 << sq
+        if self.occupancy[WHITE] & bit:
+            p = 0
+        elif self.occupancy[BLACK] & bit:
+            p = 6
+        else:
+            return None
+        board = self.board
+        while not board[p] & bit:
+            p += 1
+        return p
+
+    def move_pieces(self, move):
+        # the moving piece and the piece the move would capture, if any, as uppercase codes
+        i, j = move
+        p, q = self.piece_at(i), self.piece_at(j)
+        if q is not None:
+            return piece_codes[p].upper(), piece_codes[q].upper()
+        if self.ep and j == self.ep and p % 6 == PAWN:
+            return 'P', 'P'
+        return piece_codes[p].upper(), None
+
+    def is_tactical(self, move):
+        # returns if the move captures or promotes, the moves the search does not treat as quiet
+        i, j = move
+        if self.occupancy[self.side ^ 1] >> j & 1:
+            return True
+        if not self.board[6 * self.side + PAWN] >> i & 1:
+            return False
+        # a pawn reaching the last rank, or taking en passant
+        return j < 8 or j >= 56 or bool(self.ep) and j == self.ep
+
+    def least_valuable_attacker(self, sq, by, occupied):
+        # the square and board index of the cheapest piece of the given color attacking sq,
+        # among the occupied squares, or (None, None)
+        board = self.board
+        base = 6 * by
+        found = PAWN_ATTACKS[by ^ 1][sq] & board[base + PAWN] & occupied
+        if found:
+            return (found & -found).bit_length() - 1, base + PAWN
+        found = KNIGHT_ATTACKS[sq] & board[base + KNIGHT] & occupied
+        if found:
+            return (found & -found).bit_length() - 1, base + KNIGHT
+        diagonal, line = bishop_attacks(sq, occupied), rook_attacks(sq, occupied)
+        for kind, attacks in (BISHOP, diagonal), (ROOK, line), (QUEEN, diagonal | line), (KING, KING_ATTACKS[sq]):
+            found = attacks & board[base + kind] & occupied
+            if found:
+                return (found & -found).bit_length() - 1, base + kind
+        return None, None
+
+    def see(self, move):
+        # the material the move wins once the exchange on its target square has played out
+        # both sides keep recapturing with their cheapest piece for as long as it pays,
+        # and pieces taken off the occupancy uncover the sliders behind them
+        i, j = move
+        p, q = self.piece_at(i), self.piece_at(j)
+        if q is None and self.ep and j == self.ep and p % 6 == PAWN:
+            return see_values[PAWN]
+        gains = [see_values[q] if q is not None else 0]
+        attacker = p
+        occupied = (self.occupancy[0] | self.occupancy[1]) ^ (1 << i)
+        side = self.side ^ 1
+        while True:
+            k, kind = self.least_valuable_attacker(j, side, occupied)
+            if k is None:
+                break
+            gains.append(see_values[attacker] - gains[-1])
+            attacker = kind
+            occupied ^= 1 << k
+            side ^= 1
+        # either side may stop capturing when going on would lose more
+        while len(gains) > 1:
+            last = gains.pop()
+            gains[-1] = -max(-gains[-1], last)
+        return gains[0]
+
+    def has_pieces(self):
+        # returns if the side to move has anything besides pawns and the king
+        base = 6 * self.side
+        return any(self.board[base + KNIGHT:base + KING])
+
+    def piece_list(self, limit):
+        # returns (piece, square) of every piece on the board, white uppercase and a1 = 0, or None for more than limit
+        if bin(self.occupancy[WHITE] | self.occupancy[BLACK]).count('1') > limit:
+            return None
+        return [(piece_codes[p], sq) for p, bb in enumerate(self.board) for sq in squares(bb)]
+
+    def is_check(self):
+        # returns if the state represented by the current position is check
+        king = self.board[6 * self.side + KING]
+        return bool(king) and self.is_attacked(king.bit_length() - 1, self.side ^ 1)
+
+    def z_hash(self):
+        # Zobrist Hash of board position, recomputed from scratch
+        h = z_ep[self.ep] ^ z_castling[self.side][self.castling]
+        if self.side:
+            h ^= zobrist.black_key
+        for p, bb in enumerate(self.board):
+            for sq in squares(bb):
+                h ^= z_table[p][sq]
+        return h
+
+    def pawn_z_hash(self):
+        # the pawn key, recomputed from scratch
+        h = 0
+        for p in (PAWN, 6 + PAWN):
+            for sq in squares(self.board[p]):
+                h ^= z_table[p][sq]
+        return h
+
+
+####################################
+# square formatting helper functions
+####################################
+
+def square_index(file_index, rank_index):
+    # Gets a square index by file and rank index
+    return ord(file_index.lower()) - 97 + 8 * (int(rank_index) - 1)
+
+
+def square_file(square_index):
+    return "abcdefgh"[square_index % 8]
+
+
+def square_rank(square_index):
+    return square_index // 8 + 1
+
+
+def fen_to_bitposition(fen_string):
+    # generate a BitPosition object from a FEN string
+    board, player, castling, enpassant, halfmove, move = fen_string.split()
+    pieces = [0] * 12
+    for r, row in enumerate(board.split('/')):
+        f = 0
+        for piece in row:
+            if piece.isdigit():
+                f += int(piece)
+            else:
+                pieces[piece_codes.index(piece)] |= 1 << (f + 8 * (7 - r))
+                f += 1
+    occupancy = (pieces[0] | pieces[1] | pieces[2] | pieces[3] | pieces[4] | pieces[5],
+                 pieces[6] | pieces[7] | pieces[8] | pieces[9] | pieces[10] | pieces[11])
+
+    rights = 0
+    if 'K' in castling: rights |= WHITE_KING_SIDE
+    if 'Q' in castling: rights |= WHITE_QUEEN_SIDE
+    if 'k' in castling: rights |= BLACK_KING_SIDE
+    if 'q' in castling: rights |= BLACK_QUEEN_SIDE
+
+    ep = square_index(enpassant[0], enpassant[1]) if enpassant != '-' else 0
+
+    score, phase = 0, 0
+    for p, bb in enumerate(pieces):
+        for sq in squares(bb):
+            score += pst_table[p][sq]
+            phase += phase_values[p]
+    side = WHITE if player == 'w' else BLACK
+
+    # BitPosition(board occupancy side castling ep score depth captured hash phase pawn_hash)
+    position = BitPosition(tuple(pieces), occupancy, side, rights, ep, -score if side else score, 0, None, 0, phase, 0)
+    return position._replace(hash=position.z_hash(), pawn_hash=position.pawn_z_hash())
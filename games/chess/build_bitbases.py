@@ -0,0 +1,26 @@
+import argparse
+import os
+from games.chess.bitbases import TABLE_SIZE, endgames, default_directory, generate, pack
+
+'''
+Endgame bitbase generator
+Kept apart from the bitbases module, which the package imports through the AI, so it can be run as a script
+
+    python3 -m games.chess.build_bitbases
+writes kqk.bin, krk.bin and kpk.bin to the endgames directory, in that order as KPK needs the others
+'''
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates the endgame bitbases.')
+    parser.add_argument('--out', default=default_directory, help='the directory to write the tables to')
+    args = parser.parse_args()
+    os.makedirs(args.out, exist_ok=True)
+    tables = {}
+    for name in endgames:
+        kind = name[1]
+        promotions = (tables['q'], tables['r']) if kind == 'p' else None
+        tables[kind] = generate(kind, promotions)
+        with open(os.path.join(args.out, name + '.bin'), 'wb') as f:
+            f.write(pack(tables[kind]))
+        wins = sum(tables[kind][:TABLE_SIZE // 2])
+        print('{}: {} won positions with the strong side to move'.format(name.upper(), wins))
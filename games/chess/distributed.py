@@ -0,0 +1,362 @@
+import argparse
+import json
+import select
+import socket
+from collections import deque
+from multiprocessing import Process
+from threading import Thread
+from games.chess.move_picker import pick_moves
+from games.chess.search import Searcher, MATE, MAX_PLY, INFINITE
+from games.chess.time_manager import TimeManager
+from games.chess.transposition import TranspositionTable
+from games.chess.bitbases import Bitbases, default_directory
+
+'''
+Distributed root splitting
+A coordinator splits the root moves of the search into work items and hands them to worker processes over TCP,
+each worker runs the same engine on its own copy of the root position and sends back the score of the move
+Messages are JSON objects framed by an EOT character, as the game server does, with an event and its data
+
+Each iteration follows young brothers wait at the root: the first move is searched alone with the full window
+to set alpha, then its brothers are searched in parallel with a null window that only proves them worse
+A brother that turns out better is searched again with the full window, and when alpha improves every item still
+out with the old alpha is cancelled and sent out again with the new one
+Idle workers take the next item from the shared queue, and once it runs dry they steal a copy of an item another
+worker is still busy with, whichever copy finishes first is used and the others are cancelled
+
+Workers can run anywhere, started with
+    python3 -m games.chess.distributed --port 4000
+or locally, started by the coordinator itself, which is how the mode is tried out without a cluster
+'''
+
+EOT_CHAR = chr(4)
+# seconds the coordinator waits for a message before it looks at the clock again
+POLL_TIME = 0.01
+
+
+class Connection:
+    """ One end of a socket carrying EOT framed JSON messages
+    sock -- the connected socket
+    buffer -- the start of a message that has not fully arrived yet
+    busy -- on the coordinator, the id of the item the worker is searching, or None when it is idle
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = ''
+        self.busy = None
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def send(self, event, data=None):
+        self.sock.sendall((json.dumps({'event': event, 'data': data}) + EOT_CHAR).encode('utf-8'))
+
+    def receive(self):
+        # blocks until some data arrives, returns the messages it completes, None once the other end has closed
+        received = self.sock.recv(4096)
+        if not received:
+            return None
+        split = (self.buffer + received.decode('utf-8')).split(EOT_CHAR)
+        self.buffer = split.pop()
+        return [json.loads(message) for message in split]
+
+    def close(self):
+        self.sock.close()
+
+
+#########
+# worker
+#########
+
+class Worker:
+    """ Searches the root moves sent by a coordinator, one at a time
+    connection -- the connection to the coordinator
+    tt -- the transposition table, kept across items and positions
+    bitbases -- the endgame bitbases of the worker's machine
+    searcher -- the searcher of the current root position
+    job -- the id of the item being searched, None when idle
+    """
+
+    def __init__(self, connection, size_mb=16, bitbases=default_directory):
+        self.connection = connection
+        self.tt = TranspositionTable(size_mb)
+        self.bitbases = Bitbases(bitbases)
+        self.searcher = None
+        self.job = None
+        self.thread = None
+
+    def run(self):
+        # reads the messages of the coordinator until it says goodbye or goes away
+        while True:
+            messages = self.connection.receive()
+            if messages is None:
+                self.stop()
+                return
+            for message in messages:
+                event, data = message['event'], message['data']
+                if event == 'root':
+                    self.stop()
+                    self.set_root(data)
+                elif event == 'search':
+                    self.stop()
+                    self.job = data['id']
+                    # the clock is set up before the thread starts, so a cancel right behind the item finds it
+                    self.searcher.clock = TimeManager.unlimited()
+                    self.searcher.clock.start()
+                    self.searcher.stopped = False
+                    self.thread = Thread(target=self.search, args=(data,), daemon=True)
+                    self.thread.start()
+                elif event == 'cancel':
+                    if data['id'] == self.job:
+                        self.stop()
+                elif event == 'quit':
+                    self.stop()
+                    return
+
+    def set_root(self, data):
+        # the boards are imported here, as the AI module that holds them imports this one
+        from games.chess.ai import board_types
+        board = board_types[data['board']](data['fen'])
+        self.tt.new_search()
+        self.searcher = Searcher(board, self.tt, clock=TimeManager.unlimited(), bitbases=self.bitbases,
+                                 **data['options'])
+
+    def search(self, data):
+        # searches one root move with the window of the item and reports the score from the root's point of view
+        searcher = self.searcher
+        move = tuple(data['move'])
+        nodes = searcher.nodes
+        searcher.board.make_move(move)
+        score = -searcher.negamax(data['depth'] - 1, -data['beta'], -data['alpha'], 1)
+        searcher.board.unmake_move()
+        self.connection.send('result', {'id': data['id'], 'score': score, 'nodes': searcher.nodes - nodes,
+                                        'stopped': searcher.stopped})
+
+    def stop(self):
+        # stops the item being searched, its result still goes out marked as stopped
+        if self.thread:
+            self.searcher.clock.stop()
+            self.searcher.stopped = True
+            self.thread.join()
+            self.thread = None
+        self.job = None
+
+
+def serve(listener, size_mb=16, bitbases=default_directory):
+    # serves one coordinator after the other on a listening socket
+    while True:
+        sock, _ = listener.accept()
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = Connection(sock)
+        try:
+            Worker(connection, size_mb, bitbases).run()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            connection.close()
+
+
+##############
+# coordinator
+##############
+
+class Coordinator:
+    """ Splits the root moves of a search over workers
+    connections -- one connection to every worker
+    processes -- worker processes started by the coordinator, for a local run
+    items -- id -> the work item, a dict of the move, its window and depth, and the workers searching it
+    nodes -- the nodes searched by all workers in the last search
+    depth -- the depth of the last iteration the last search completed
+    """
+
+    def __init__(self, addresses=(), local=0, size_mb=16, bitbases=default_directory):
+        self.processes = []
+        self.connections = []
+        for _ in range(local):
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.bind(('localhost', 0))
+            listener.listen(1)
+            process = Process(target=serve, args=(listener, size_mb, bitbases), daemon=True)
+            process.start()
+            self.processes.append(process)
+            addresses = list(addresses) + [listener.getsockname()]
+            listener.close()
+        for host, port in addresses:
+            sock = socket.create_connection((host, int(port)))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.connections.append(Connection(sock))
+        self.items = {}
+        self.next_id = 0
+        self.nodes = 0
+        self.depth = 0
+
+    @classmethod
+    def from_setting(cls, setting, size_mb=16, bitbases=default_directory):
+        # a count of local workers to start, or a comma separated list of host:port
+        # bitbases -- the directory of the bitbases for local workers, remote ones use their own
+        if setting.isdigit():
+            return cls(local=int(setting), size_mb=size_mb, bitbases=bitbases)
+        return cls([address.rsplit(':', 1) for address in setting.split(',')], size_mb=size_mb)
+
+    def search(self, board, fen, board_type, options, clock, tt=None):
+        # iteratively deepens a search of the board split over the workers, returns the best move
+        # fen and board_type -- how the workers build the same board
+        clock.start()
+        self.nodes = 0
+        self.depth = 0
+        for connection in self.connections:
+            connection.send('root', {'fen': fen, 'board': board_type, 'options': options})
+        entry = tt and tt.probe(board.hash)
+        moves = list(pick_moves(board, entry and entry[3]))
+        if len(moves) <= 1:
+            return moves[0] if moves else None
+        best_move = None
+        for depth in range(1, min(options.get('depth_limit', MAX_PLY), MAX_PLY - 1) + 1):
+            result = self.search_root(moves, depth, clock)
+            if result is None:
+                break
+            score, best_move, scores = result
+            self.depth = depth
+            # the next iteration starts with the best move, followed by the others from best to worst
+            moves.sort(key=lambda move: -scores.get(move, -INFINITE))
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+            if abs(score) >= MATE - MAX_PLY or not clock.iteration_done(best_move):
+                break
+        return best_move or moves[0]
+
+    def search_root(self, moves, depth, clock):
+        # one iteration, returns (score, best move, move -> score) or None if the clock ran out first
+        alpha, beta = -INFINITE, INFINITE
+        best_move = None
+        scores = {}
+        pending = deque()
+        # move -> the id of its latest item, for the moves still unresolved
+        latest = {}
+
+        def queue(move, alpha, beta, full, front=False):
+            self.next_id += 1
+            self.items[self.next_id] = {'id': self.next_id, 'move': move, 'depth': depth, 'alpha': alpha,
+                                        'beta': beta, 'full': full, 'workers': set()}
+            latest[move] = self.next_id
+            if front:
+                pending.appendleft(self.next_id)
+            else:
+                pending.append(self.next_id)
+
+        # young brothers wait for the eldest, which sets alpha for them
+        queue(moves[0], alpha, beta, True)
+        eldest_done = False
+        while latest:
+            if clock.out_of_time():
+                self.cancel_all()
+                return None
+            self.dispatch(pending, latest)
+            for connection, message in self.poll():
+                if message['event'] != 'result':
+                    continue
+                data = message['data']
+                item = self.items.get(data['id'])
+                connection.busy = None
+                self.nodes += data['nodes']
+                if item is None:
+                    continue
+                item['workers'].discard(connection)
+                move = item['move']
+                if data['stopped'] or latest.get(move) != item['id']:
+                    # cancelled, stale or already finished by another copy
+                    continue
+                # the first copy to finish wins, the others are called off
+                self.cancel(item)
+                del latest[move]
+                score = data['score']
+                if not item['full'] and score > item['alpha']:
+                    # the null window failed high, the move may be better than the best so far
+                    queue(move, alpha, beta, True, front=True)
+                    continue
+                scores[move] = score
+                if score > alpha:
+                    alpha, best_move = score, move
+                    # items still out with the old alpha would waste their time, they go out again with the new one
+                    for other in list(latest):
+                        old = self.items[latest[other]]
+                        if not old['full'] and old['alpha'] < alpha:
+                            self.cancel(old)
+                            if old['id'] in pending:
+                                pending.remove(old['id'])
+                            queue(other, alpha, alpha + 1, False)
+                if not eldest_done:
+                    eldest_done = True
+                    for brother in moves[1:]:
+                        queue(brother, alpha, alpha + 1, False)
+        self.items.clear()
+        return alpha, best_move or moves[0], scores
+
+    def dispatch(self, pending, latest):
+        # hands the pending items to idle workers, and copies of running items once nothing is pending
+        for connection in self.connections:
+            if connection.busy is not None:
+                continue
+            if pending:
+                item = self.items[pending.popleft()]
+            else:
+                # steal the oldest item that only one worker is searching
+                running = [self.items[i] for i in latest.values() if len(self.items[i]['workers']) == 1]
+                if not running:
+                    return
+                item = min(running, key=lambda item: item['id'])
+            item['workers'].add(connection)
+            connection.busy = item['id']
+            connection.send('search', {'id': item['id'], 'move': item['move'], 'depth': item['depth'],
+                                       'alpha': item['alpha'], 'beta': item['beta']})
+
+    def poll(self):
+        # the messages that arrive within the poll time, with the connection they came from
+        busy = [connection for connection in self.connections if connection.busy is not None]
+        if not busy:
+            return []
+        ready, _, _ = select.select(busy, [], [], POLL_TIME)
+        received = []
+        for connection in ready:
+            messages = connection.receive()
+            if messages is None:
+                raise ConnectionError('worker closed the connection')
+            received.extend((connection, message) for message in messages)
+        return received
+
+    def cancel(self, item):
+        for connection in item['workers']:
+            connection.send('cancel', {'id': item['id']})
+        item['workers'] = set()
+
+    def cancel_all(self):
+        for item in self.items.values():
+            self.cancel(item)
+        self.items.clear()
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send('quit')
+            except OSError:
+                pass
+            connection.close()
+        for process in self.processes:
+            process.terminate()
+            process.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs a worker of the distributed search.')
+    parser.add_argument('--host', default='', help='the interface to listen on')
+    parser.add_argument('--port', type=int, default=4000, help='the port to listen on')
+    parser.add_argument('--hash', type=int, default=16, help='the size of the transposition table in MB')
+    parser.add_argument('--bitbases', default=default_directory, help='the directory of the endgame bitbases')
+    args = parser.parse_args()
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((args.host, args.port))
+    server.listen(1)
+    print('Worker listening on port {}'.format(args.port))
+    serve(server, args.hash, args.bitbases)
@@ -0,0 +1,125 @@
+from array import array
+from games.chess.evaluation import taper, pawn_structure, passed_king_distance
+
+'''
+Evaluation caches
+Two small direct-mapped tables sit in front of the evaluation of every board representation:
+the eval cache maps the full Zobrist hash to the finished evaluation, and the pawn hash maps a Zobrist key of the
+pawns alone to the pawn-structure score and the passed pawn masks, which only change when a pawn moves or is taken
+A slot is simply overwritten by the next position that maps to it
+
+Like the transposition table, each slot keeps its key XORed with its data, so a slot written halfway by a
+ponder thread reads as a miss instead of as another position's score
+Every process has its own caches, their sizes come from the "evalcache" and "pawnhash" AI settings
+'''
+
+MASK64 = (1 << 64) - 1
+# default sizes in MB
+EVAL_CACHE_MB = 2
+PAWN_HASH_MB = 1
+
+
+def slot_count(size_mb, slot_bytes):
+    # the largest power of two of slots that fits in the size, so a key is masked to its slot
+    count = 1
+    while count * 2 * slot_bytes <= size_mb * 1024 * 1024:
+        count *= 2
+    return count
+
+
+class EvalCache:
+    """ A direct-mapped cache of evaluations
+    keys -- the Zobrist hash of the position in each slot, XORed with its value
+    values -- the evaluation of that position for the side to move
+    probes -- the number of lookups, for the hit rate
+    hits -- the number of lookups that found their position
+    """
+
+    def __init__(self, size_mb=EVAL_CACHE_MB):
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        # drops every entry, the caches are resized in place as the boards hold on to them
+        count = slot_count(size_mb, 16)
+        self.mask = count - 1
+        self.keys = array('Q', bytes(8 * count))
+        self.values = array('q', bytes(8 * count))
+        self.probes = self.hits = 0
+
+    def probe(self, key):
+        # the cached evaluation of the position, or None
+        self.probes += 1
+        i = key & self.mask
+        value = self.values[i]
+        if self.keys[i] ^ (value & MASK64) == key:
+            self.hits += 1
+            return value
+        return None
+
+    def store(self, key, value):
+        i = key & self.mask
+        self.values[i] = value
+        self.keys[i] = key ^ (value & MASK64)
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+
+class PawnHash:
+    """ A direct-mapped cache of pawn structures
+    keys -- the pawn key of the structure in each slot, XORed with its data
+    scores -- the packed pawn-structure score, from white's point of view
+    passed -- the masks of the passed white and black pawns, two to a slot
+    probes -- the number of lookups, for the hit rate
+    hits -- the number of lookups that found their structure
+    """
+
+    def __init__(self, size_mb=PAWN_HASH_MB):
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        count = slot_count(size_mb, 32)
+        self.mask = count - 1
+        self.keys = array('Q', bytes(8 * count))
+        self.scores = array('q', bytes(8 * count))
+        self.passed = array('Q', bytes(16 * count))
+        self.probes = self.hits = 0
+
+    def probe(self, board):
+        # (score, white passed, black passed) of the pawns of the board, scored and stored on a miss
+        self.probes += 1
+        key = board.pawn_hash
+        i = key & self.mask
+        score, white_passed, black_passed = self.scores[i], self.passed[2 * i], self.passed[2 * i + 1]
+        if self.keys[i] ^ (score & MASK64) ^ white_passed ^ black_passed == key:
+            self.hits += 1
+            return score, white_passed, black_passed
+        score, white_passed, black_passed = pawn_structure(*board.pawn_masks())
+        self.scores[i], self.passed[2 * i], self.passed[2 * i + 1] = score, white_passed, black_passed
+        self.keys[i] = key ^ (score & MASK64) ^ white_passed ^ black_passed
+        return score, white_passed, black_passed
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+
+eval_cache = EvalCache()
+pawn_hash = PawnHash()
+
+
+def evaluate(board, score, black):
+    # the tapered evaluation of a board for the side to move, from the caches when they have it
+    # score -- the packed piece-square score of the board, from white's point of view
+    # black -- whether black is to move
+    value = eval_cache.probe(board.hash)
+    if value is not None:
+        return value
+    pawns, white_passed, black_passed = pawn_hash.probe(board)
+    score += pawns
+    if white_passed or black_passed:
+        white_king, black_king = board.king_squares()
+        if white_king >= 0 and black_king >= 0:
+            score += passed_king_distance(white_passed, black_passed, white_king, black_king)
+    value = taper(-score if black else score, board.phase)
+    eval_cache.store(board.hash, value)
+    return value
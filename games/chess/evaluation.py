@@ -0,0 +1,227 @@
+'''
+Tapered piece-square-table evaluation
+Every piece on every square is worth a middlegame and an endgame score, packed together into one int
+so a whole move can be scored by adding a few table entries, the way the positions carry it in their score field
+The packed total is only split and blended by the game phase when a position is actually evaluated
+
+Tables are laid out on the 120 square mailbox, from the point of view of the side to move (uppercase)
+An opponent piece on square i is worth the negated value of our piece on square 119 - i,
+so rotating the board negates the score, just as it swaps the case of the pieces
+'''
+
+A1, H1, A8, H8 = 91, 98, 21, 28
+
+EG_SHIFT = 32
+
+
+def S(mg, eg):
+    # packs a middlegame and an endgame score into one int, the packing is linear so packed scores add and negate
+    return mg + (eg << EG_SHIFT)
+
+
+def mg_value(score):
+    return ((score + (1 << (EG_SHIFT - 1))) & ((1 << EG_SHIFT) - 1)) - (1 << (EG_SHIFT - 1))
+
+
+def eg_value(score):
+    return (score - mg_value(score)) >> EG_SHIFT
+
+
+# phase contributed by each piece, a full set of pieces is MAX_PHASE
+phase_weights = {'P': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0}
+MAX_PHASE = 24
+
+
+def taper(score, phase):
+    # blends the packed score between its endgame (phase 0) and middlegame (MAX_PHASE) values
+    phase = min(phase, MAX_PHASE)
+    return (mg_value(score) * phase + eg_value(score) * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+material = {
+    'P': S(82, 94),
+    'N': S(337, 281),
+    'B': S(365, 297),
+    'R': S(477, 512),
+    'Q': S(1025, 936),
+    'K': S(20000, 20000)
+}
+
+# the middlegame material of each piece, for the search to weigh captures with
+piece_values = {p: mg_value(score) for p, score in material.items()}
+
+# tables as seen from the side to move, rank 8 first
+_pawn_mg = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0)
+_pawn_eg = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    90, 90, 90, 90, 90, 90, 90, 90,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+    5, 5, 5, 5, 5, 5, 5, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0)
+_knight = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50)
+_bishop = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20)
+_rook_mg = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0)
+_rook_eg = (
+    5, 5, 5, 5, 5, 5, 5, 5,
+    10, 10, 10, 10, 10, 10, 10, 10,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0)
+_queen = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20)
+_king_mg = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20)
+_king_eg = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50)
+
+_tables = {
+    'P': (_pawn_mg, _pawn_eg),
+    'N': (_knight, _knight),
+    'B': (_bishop, _bishop),
+    'R': (_rook_mg, _rook_eg),
+    'Q': (_queen, _queen),
+    'K': (_king_mg, _king_eg)
+}
+
+# piece code -> packed material and square score for each of the 120 squares, zero for empty squares
+pst = {'.': [0] * 120}
+for _p, (_mg, _eg) in _tables.items():
+    pst[_p] = [0] * 120
+    pst[_p.lower()] = [0] * 120
+    for _k in range(64):
+        _i = A8 + 10 * (_k // 8) + _k % 8
+        pst[_p][_i] = material[_p] + S(_mg[_k], _eg[_k])
+        pst[_p.lower()][119 - _i] = -pst[_p][_i]
+
+
+def board_score(board):
+    # the packed score of a mailbox board, computed from scratch
+    return sum(pst[p][i] for i, p in enumerate(board) if p in pst)
+
+
+def board_phase(board):
+    # the game phase of a mailbox board, computed from scratch
+    return sum(phase_weights[p.upper()] for p in board if p.isalpha())
+
+
+#################
+# pawn structure
+#################
+
+# pawn structure is scored on pawn bitboards with a1 = 0, from white's point of view, and cached by the pawn hash
+DOUBLED = S(-10, -20)
+ISOLATED = S(-10, -15)
+# passed pawn bonus by the rank of the pawn, counted from its own side
+passed_bonus = [S(mg, eg) for mg, eg in ((0, 0), (0, 5), (5, 10), (10, 20), (20, 35), (35, 60), (60, 100), (0, 0))]
+# endgame bonus for every square our king is nearer to the stop square of a passed pawn than theirs, times its rank
+PASSED_KING = 2
+
+file_masks = [0x0101010101010101 << f for f in range(8)]
+adjacent_files = [(file_masks[f - 1] if f > 0 else 0) | (file_masks[f + 1] if f < 7 else 0) for f in range(8)]
+# the squares in front of a pawn of each color, on its own file and on both sides of it
+front_spans = (
+    [(file_masks[sq % 8] | adjacent_files[sq % 8]) & ~((1 << 8 * (sq // 8 + 1)) - 1) for sq in range(64)],
+    [(file_masks[sq % 8] | adjacent_files[sq % 8]) & ((1 << 8 * (sq // 8)) - 1) for sq in range(64)]
+)
+
+
+def pawn_structure(white, black):
+    # the packed score of doubled, isolated and passed pawns, with the masks of the passed white and black pawns
+    score = 0
+    passed = [0, 0]
+    for side, own, other in (0, white, black), (1, black, white):
+        side_score = 0
+        for f in range(8):
+            count = bin(own & file_masks[f]).count('1')
+            if count > 1:
+                side_score += DOUBLED * (count - 1)
+            if count and not own & adjacent_files[f]:
+                side_score += ISOLATED * count
+        bb = own
+        while bb:
+            bit = bb & -bb
+            bb ^= bit
+            sq = bit.bit_length() - 1
+            span = front_spans[side][sq]
+            # passed with no enemy pawn ahead on its file or next to it, and no pawn of ours ahead of it
+            if not span & other and not span & file_masks[sq % 8] & own:
+                passed[side] |= bit
+                side_score += passed_bonus[sq // 8 if side == 0 else 7 - sq // 8]
+        score += -side_score if side else side_score
+    return score, passed[0], passed[1]
+
+
+def passed_king_distance(white_passed, black_passed, white_king, black_king):
+    # the packed endgame score of the kings racing to the stop squares of the passed pawns, from white's point of view
+    eg = 0
+    for side, bb, own_king, other_king in (0, white_passed, white_king, black_king), \
+                                          (1, black_passed, black_king, white_king):
+        while bb:
+            bit = bb & -bb
+            bb ^= bit
+            sq = bit.bit_length() - 1
+            stop = sq - 8 if side else sq + 8
+            rank = 7 - sq // 8 if side else sq // 8
+            distance = max(abs(other_king % 8 - stop % 8), abs(other_king // 8 - stop // 8)) - \
+                max(abs(own_king % 8 - stop % 8), abs(own_king // 8 - stop // 8))
+            eg += -PASSED_KING * rank * distance if side else PASSED_KING * rank * distance
+    return S(0, eg)
@@ -35,6 +35,11 @@ class Game(BaseGame):
         self._session = ""
         self._turns_to_draw = 0
 
+        # (file, rank) -> the uncaptured Piece on that square, and each indexed Piece -> its square
+        # kept up to date by the GameManager as piece deltas are merged
+        self._squares = {}
+        self._piece_squares = {}
+
         self.name = "Chess"
 
         self._game_object_classes = {
@@ -123,3 +128,32 @@ class Game(BaseGame):
         :rtype: int
         """
         return self._turns_to_draw
+
+    def piece_at(self, file, rank):
+        """ Gets the uncaptured Piece on a square, from the square index instead of a scan of the pieces.
+
+        Args:
+            file (str): The file of the square, [a-h].
+            rank (int): The rank of the square, [1-8].
+
+        Returns:
+            Piece: The Piece on the square, or None if it is empty.
+        """
+        return self._squares.get((file, rank))
+
+    def game_object_updated(self, game_object):
+        """ Moves a Piece in the square index after a delta has changed it.
+
+        Args:
+            game_object (GameObject): The game object the delta changed.
+        """
+        if not isinstance(game_object, Piece):
+            return
+        old = self._piece_squares.pop(game_object, None)
+        # another piece may have moved onto the old square already
+        if old is not None and self._squares.get(old) is game_object:
+            del self._squares[old]
+        if not game_object.captured:
+            square = (game_object.file, game_object.rank)
+            self._squares[square] = game_object
+            self._piece_squares[game_object] = square
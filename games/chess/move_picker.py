@@ -0,0 +1,52 @@
+from games.chess.evaluation import piece_values as values
+
+'''
+Staged move picker
+Moves are handed to the search one stage at a time, best guesses first:
+the hash move, winning captures by MVV-LVA, killer moves, quiet moves by history, and losing captures last
+Most cutoffs happen on the first move or two, so a later stage is only generated once the earlier ones have
+failed to cut off, and the quiet moves are never generated at all at many nodes
+'''
+
+
+def mvv_lva(board, move):
+    # most valuable victim first, least valuable attacker breaking ties
+    p, q = board.move_pieces(move)
+    return values[q] if q else 0, -values[p]
+
+
+def pick_moves(board, hash_move=None, killers=(), history=None):
+    # the legal moves of a board, generated lazily in stages
+    # hash_move - the best move from the transposition table, trusted to be legal for a board with its hash
+    # killers - quiet moves that caused a cutoff elsewhere in the tree, the killers of this ply and the countermove
+    # history - move -> score, for the order of the remaining quiet moves
+    if hash_move:
+        yield hash_move
+    # the pins and checks of the node, shared by the batches below, once the hash move has failed to cut off
+    checks = board.pins_and_checks()
+
+    # captures and promotions, a capture that loses material in the exchange that follows is put off until the end
+    winning, losing = [], []
+    for move in board.gen_legal_moves(True, False, checks):
+        if move == hash_move: continue
+        p, q = board.move_pieces(move)
+        if q and values[p] > values[q] and board.see(move) < 0:
+            losing.append(move)
+        else:
+            winning.append(move)
+    winning.sort(key=lambda move: mvv_lva(board, move), reverse=True)
+    yield from winning
+
+    # the killers are checked one at a time, the quiet moves are only generated once they fail to cut off
+    tried = [hash_move]
+    for move in killers:
+        if move and move not in tried and board.is_legal_quiet(move, checks):
+            tried.append(move)
+            yield move
+    quiet = [move for move in board.gen_legal_moves(False, True, checks) if move not in tried]
+    if history:
+        quiet.sort(key=lambda move: history.get(move, 0), reverse=True)
+    yield from quiet
+
+    losing.sort(key=lambda move: mvv_lva(board, move), reverse=True)
+    yield from losing
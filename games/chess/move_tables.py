@@ -0,0 +1,57 @@
+'''
+Move tables for the mailbox boards
+Every destination a piece can reach from a square is worked out once at import, so move generation only walks
+these tables instead of stepping through directions and bouncing off the padding squares
+Moves are stored as ready-made (from, to) tuples, so generating a move does not build a new tuple either
+'''
+
+A1, H1, A8, H8 = 91, 98, 21, 28
+N, E, S, W = -10, 1, 10, -1
+
+directions = {
+    'N': (N + N + E, E + N + E, E + S + E, S + S + E, S + S + W, W + S + W, W + N + W, N + N + W),
+    'B': (N + E, S + E, S + W, N + W),
+    'R': (N, E, S, W),
+    'Q': (N, E, S, W, N + E, S + E, S + W, N + W),
+    'K': (N, E, S, W, N + E, S + E, S + W, N + W)
+}
+
+
+def on_board(i):
+    return A8 <= i <= H1 and 0 < i % 10 < 9
+
+
+def _ray(i, d):
+    # the squares from i in direction d, nearest first
+    ray = []
+    j = i + d
+    while on_board(j):
+        ray.append(j)
+        j += d
+    return tuple(ray)
+
+
+# step_squares[p][i] - the squares a knight or king on square i attacks
+step_squares = {p: [tuple(i + d for d in directions[p] if on_board(i + d)) if on_board(i) else ()
+                    for i in range(120)] for p in 'NK'}
+
+# ray_squares[p][i] - for a slider on square i, one tuple of squares per direction, nearest first
+ray_squares = {p: [tuple(r for r in (_ray(i, d) for d in directions[p]) if r) if on_board(i) else ()
+                   for i in range(120)] for p in 'BRQ'}
+
+# the same tables as (i, j) moves
+step_moves = {p: [tuple((i, j) for j in table[i]) for i in range(120)] for p, table in step_squares.items()}
+ray_moves = {p: [tuple(tuple((i, j) for j in r) for r in table[i]) for i in range(120)]
+             for p, table in ray_squares.items()}
+
+# pawn tables, by the direction the pawns travel in: N for the side at the bottom of the board, S for the top
+pawn_push_moves = {}
+pawn_double_moves = {}
+pawn_capture_moves = {}
+pawn_capture_squares = {}
+for _d, _start in ((N, A1 + N), (S, A8 + S)):
+    pawn_push_moves[_d] = [(i, i + _d) if on_board(i) and on_board(i + _d) else None for i in range(120)]
+    pawn_double_moves[_d] = [(i, i + 2 * _d) if _start <= i < _start + 8 else None for i in range(120)]
+    pawn_capture_squares[_d] = [tuple(i + _d + e for e in (W, E) if on_board(i) and on_board(i + _d + e))
+                                for i in range(120)]
+    pawn_capture_moves[_d] = [tuple((i, j) for j in pawn_capture_squares[_d][i]) for i in range(120)]
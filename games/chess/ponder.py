@@ -0,0 +1,51 @@
+from threading import Thread
+
+'''
+Pondering
+Once our move is played, the reply we expect from the opponent is made on a copy of the board and searched in a
+background thread while the opponent thinks, filling the transposition table as it goes
+If the opponent plays the expected move the search carries on as our own, now under a real clock, and otherwise
+it is stopped and thrown away, the entries it left in the table may still serve the real search
+The search runs on its own board, but writes to the live transposition table while the main thread follows the game,
+which is safe as every entry keeps its key XORed with its data, so one written halfway reads as a miss
+'''
+
+
+class Ponderer:
+    """ A search of the position after the expected reply, run on the opponent's time
+    searcher -- the Searcher of the pondered board, started with an unlimited clock
+    hash -- the Zobrist hash of the pondered position
+    move -- the best move found, once the search has ended
+    ours -- whether the opponent played the expected move, and the search runs under our clock
+    """
+
+    def __init__(self, searcher):
+        self.searcher = searcher
+        self.hash = searcher.board.hash
+        self.move = None
+        self.ours = False
+        self.thread = Thread(target=self.run, name='ponder', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        self.move = self.searcher.iterate()
+
+    def hit(self, clock):
+        # the opponent played the expected move, the search goes on under our clock
+        # the clock is started once, at the first hit, later updates of the same turn leave it running
+        if self.ours:
+            return
+        self.ours = True
+        clock.start()
+        self.searcher.clock = clock
+
+    def result(self):
+        # waits for the search to end and returns its best move
+        self.thread.join()
+        return self.move
+
+    def cancel(self):
+        # the opponent played something else, the search is stopped and its result ignored
+        self.searcher.clock.stop()
+        self.searcher.stopped = True
+        self.thread.join()
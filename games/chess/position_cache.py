@@ -0,0 +1,120 @@
+import hashlib
+import mmap
+import os
+from games.chess.transposition import ENTRY_BYTES, pack_data, unpack_data
+
+try:
+    import fcntl
+except ImportError:
+    # no file locks on Windows, merges from concurrent games may then overwrite each other's entries
+    fcntl = None
+
+'''
+Persistent position cache
+A fixed size file of transposition table entries, memory mapped, that outlives the game: positions searched deeply
+in one game are merged into it at the end, and later games (and other processes) find them again
+
+Entries use the packed layout of the transposition table, the key XORed with the data word, so a reader never
+trusts an entry torn by a concurrent writer; writers merge under an exclusive lock on the file
+The table is open addressed, a key lives in one of a few slots from its home slot on
+
+Moves are stored as the board representation numbers them, so keys are salted with the name of the board type
+and a file shared between board types only ever answers with moves of the asking type
+The words are stored in the byte order of the machine, a cache file is not meant to move between machines
+'''
+
+# slots searched from the home slot of a key
+PROBES = 4
+# only entries searched at least this deep are worth keeping
+CACHE_DEPTH = 4
+
+
+def board_salt(name):
+    # a fixed 64-bit salt for the keys of a board type
+    return int.from_bytes(hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class PositionCache:
+    """ A memory mapped, open addressed table of deeply searched positions
+    path -- the cache file, created at size_mb if missing, an existing file keeps its own size
+    salt -- XORed into every key, see board_salt
+    slots -- the number of entries the file holds
+    """
+
+    def __init__(self, path, size_mb=64, salt=0):
+        self.path = path
+        self.salt = salt
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.lock()
+        try:
+            if os.fstat(self.fd).st_size < ENTRY_BYTES:
+                os.ftruncate(self.fd, size_mb * (1 << 20) // ENTRY_BYTES * ENTRY_BYTES)
+        finally:
+            self.unlock()
+        size = os.fstat(self.fd).st_size // ENTRY_BYTES * ENTRY_BYTES
+        # mapping the file reads nothing yet, pages come in as the search probes them
+        self.map = mmap.mmap(self.fd, size)
+        self.table = memoryview(self.map).cast('Q')
+        self.slots = size // ENTRY_BYTES
+        self.hits = 0
+
+    def lock(self):
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def unlock(self):
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def probe(self, key):
+        # returns (depth, score, flag, move) for the position, or None
+        key ^= self.salt
+        table = self.table
+        home = key % self.slots
+        for i in range(PROBES):
+            slot = (home + i) % self.slots * 2
+            data = table[slot + 1]
+            if not data:
+                return None
+            if table[slot] ^ data == key:
+                self.hits += 1
+                return unpack_data(data)
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        # keeps the entry unless the slots of its key all hold deeper ones
+        key ^= self.salt
+        table = self.table
+        home = key % self.slots
+        target, target_depth = None, depth + 1
+        for i in range(PROBES):
+            slot = (home + i) % self.slots * 2
+            data = table[slot + 1]
+            if not data or table[slot] ^ data == key:
+                if data and (data >> 16) & 0xFF > depth:
+                    return
+                target = slot
+                break
+            # otherwise replace the shallowest entry no deeper than this one
+            if (data >> 16) & 0xFF < target_depth:
+                target, target_depth = slot, (data >> 16) & 0xFF
+        if target is None:
+            return
+        data = pack_data(depth, score, flag, move)
+        table[target] = key ^ data
+        table[target + 1] = data
+
+    def merge(self, tt, min_depth=CACHE_DEPTH):
+        # writes the deep entries of a transposition table into the file, under the lock
+        self.lock()
+        try:
+            for key, depth, score, flag, move in tt.entries(min_depth):
+                self.store(key, depth, score, flag, move)
+            self.map.flush()
+        finally:
+            self.unlock()
+
+    def close(self):
+        self.table.release()
+        self.map.close()
+        os.close(self.fd)
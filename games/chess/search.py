@@ -0,0 +1,384 @@
+from math import log
+from collections import defaultdict
+from games.chess.transposition import EXACT, LOWER, UPPER
+from games.chess.evaluation import piece_values as values
+from games.chess.move_picker import pick_moves, mvv_lva
+from games.chess.time_manager import TimeManager
+from games.chess.position_cache import CACHE_DEPTH
+from games.chess.zobrist import SIDE_BIT
+from games.chess.bitbases import KNOWN_WIN
+
+'''
+Principal variation search
+A negamax alpha-beta search, iteratively deepened, on a board with the make/unmake interface of SearchBoard
+Every score is from the point of view of the side to move
+
+Each iteration searches the principal variation of the previous one first, and the rest of the moves with a null
+window that only proves them worse, re-searching a move with the full window when it turns out better
+Iterations after the first start from a narrow aspiration window around the last score, and widen it only on a fail
+The time manager decides whether another iteration is started, and the clock is only read every few nodes
+'''
+
+# checkmate at the root, mates further away score less so the shortest one is preferred
+MATE = 100000
+INFINITE = MATE + 1
+# the deepest line the search will follow, including extensions
+MAX_PLY = 64
+# half width of the first aspiration window, doubled on every fail
+ASPIRATION = 50
+# the clock is read once every this many nodes
+CHECK_NODES = 1024
+# the most a position is expected to gain beyond the material it captures, for delta pruning
+DELTA_MARGIN = 200
+# reverse futility and futility pruning run this many plies from the horizon, with this margin per ply
+FUTILITY_DEPTH = 3
+FUTILITY_MARGIN = 120
+# late move reductions start after this many moves, and reduce by depth and move number
+LMR_MOVES = 3
+MAX_MOVES = 64
+lmr_reductions = [[0] * MAX_MOVES] + [[0] + [int(0.5 + log(d) * log(m) / 2.5) for m in range(1, MAX_MOVES)]
+                                      for d in range(1, MAX_PLY)]
+
+
+def bound(score, alpha, beta):
+    # the bound type of a score returned by a search with the (alpha, beta) window
+    if score <= alpha:
+        return UPPER
+    if score >= beta:
+        return LOWER
+    return EXACT
+
+
+def score_to_tt(score, ply):
+    # mate scores are stored as the distance from the stored node rather than from the root
+    if score >= MATE - MAX_PLY:
+        return score + ply
+    if score <= -MATE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE - MAX_PLY:
+        return score - ply
+    if score <= -MATE + MAX_PLY:
+        return score + ply
+    return score
+
+
+def tt_cutoff(entry, depth, alpha, beta, ply):
+    # the score of a transposition table entry, if it is deep and tight enough to end the search
+    e_depth, e_score, e_flag, e_move = entry
+    if e_depth < depth:
+        return None
+    e_score = score_from_tt(e_score, ply)
+    if e_flag == EXACT or (e_flag == LOWER and e_score >= beta) or (e_flag == UPPER and e_score <= alpha):
+        return e_score
+    return None
+
+
+class Searcher:
+    """ An iterative deepening principal variation search of one board
+    board -- the board to search, moves are made and unmade on it and it is left as it was found
+    tt -- the transposition table, shared with earlier searches
+    depth_limit -- the deepest iteration to run
+    time_limit -- seconds after which the search stops and returns the best move found so far, without a clock
+    clock -- the TimeManager that decides when the search stops
+    cache -- a PositionCache of positions from earlier games, looked up when the table misses a deep node
+    bitbases -- the endgame Bitbases, probed to end the search of the positions they know
+    helper -- 0 for the main search, or the index of a lazy SMP helper, helpers vary the depth and the root move order
+    killers -- ply -> the last two quiet moves that caused a cutoff at that ply
+    history -- move -> bonus for each cutoff, growing with the depth searched below it
+    countermoves -- move -> the quiet move that last refuted it
+    pv -- the triangular principal variation table, pv[ply] is the best line found from ply onwards
+    best_pv -- the line of the best move, kept apart from pv as an iteration that is stopped clears the root line
+    nodes -- the number of nodes searched
+    null_move, lmr, reverse_futility, futility -- switches for the selective search
+    """
+
+    def __init__(self, board, tt, depth_limit=MAX_PLY, time_limit=10, null_move=True, lmr=True,
+                 reverse_futility=True, futility=True, clock=None,
+                 helper=0, cache=None, bitbases=None):
+        self.board = board
+        self.tt = tt
+        self.depth_limit = min(depth_limit, MAX_PLY - 1)
+        self.clock = clock or TimeManager(time_limit, time_limit)
+        self.null_move = null_move
+        self.lmr = lmr
+        self.reverse_futility = reverse_futility
+        self.futility = futility
+        self.helper = helper
+        self.cache = cache
+        self.bitbases = bitbases
+        self.stopped = False
+        self.killers = defaultdict(lambda: [None, None])
+        self.history = defaultdict(int)
+        self.countermoves = {}
+        self.pv = [[None] * MAX_PLY for _ in range(MAX_PLY)]
+        self.pv_length = [0] * MAX_PLY
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.best_move = None
+        self.best_pv = []
+
+    def iterate(self):
+        # searches one ply deeper at a time until the depth or time limit, returns the best move
+        self.clock.start()
+        self.stopped = False
+        self.tt.new_search()
+        moves = list(self.board.gen_legal_moves())
+        if len(moves) <= 1:
+            # a forced move needs no search, and without moves there is nothing to search
+            self.best_move = moves[0] if moves else None
+            self.best_pv = moves[:1]
+            return self.best_move
+        score = 0
+        for depth in range(1, self.depth_limit + 1):
+            delta = ASPIRATION
+            if depth > 1:
+                alpha, beta = max(score - delta, -INFINITE), min(score + delta, INFINITE)
+            else:
+                alpha, beta = -INFINITE, INFINITE
+            # odd helpers run a ply ahead, so the processes spread over more than one depth
+            search_depth = min(depth + self.helper % 2, self.depth_limit)
+            while True:
+                value = self.negamax(search_depth, alpha, beta, 0)
+                if self.stopped:
+                    break
+                # widen only the side of the window that failed
+                delta *= 2
+                if value <= alpha:
+                    alpha = max(value - delta, -INFINITE)
+                elif value >= beta:
+                    beta = min(value + delta, INFINITE)
+                else:
+                    break
+            if self.pv_length[0]:
+                # moves of an unfinished iteration only make it here once they have been searched in full
+                self.best_move = self.pv[0][0]
+                self.best_pv = self.pv[0][:self.pv_length[0]]
+            if self.stopped:
+                break
+            score = self.score = value
+            self.depth = search_depth
+            if abs(score) >= MATE - MAX_PLY:
+                # a forced mate has been found, deeper iterations will not change it
+                break
+            if not self.clock.iteration_done(self.best_move):
+                break
+        if self.best_move is None:
+            # the clock ran out before the first iteration finished a single root move, the move the table or
+            # the move picker would have searched first is better than none
+            entry = self.tt.probe(self.board.hash)
+            hash_move = entry and entry[3]
+            self.best_move = next(pick_moves(self.board, hash_move if hash_move in moves else None))
+            self.best_pv = [self.best_move]
+        return self.best_move
+
+    def principal_variation(self):
+        return list(self.best_pv)
+
+    def negamax(self, depth, alpha, beta, ply, null_allowed=True):
+        board = self.board
+        tt = self.tt
+        self.pv_length[ply] = 0
+        in_check = board.is_check()
+        if in_check:
+            # check extension, a check is searched one ply deeper so the answer to it is seen
+            depth += 1
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self.quiescence(alpha, beta, ply)
+
+        self.nodes += 1
+        if self.nodes % CHECK_NODES == 0 and self.clock.out_of_time():
+            self.stopped = True
+        if self.stopped:
+            return 0
+
+        if ply and self.bitbases and not in_check:
+            # a known draw ends the search here, a known win is searched on so the mate can still be found,
+            # and is only scored by the bitbase at the leaves
+            # probed before the table, which may hold a heuristic score of the draw from a search without bitbases
+            if self.bitbases.probe(board, board.hash & SIDE_BIT) == 0:
+                return 0
+
+        entry = tt.probe(board.hash)
+        if not entry and self.cache and depth >= CACHE_DEPTH:
+            entry = self.cache.probe(board.hash)
+            if entry:
+                # copied into the table, so the cache is read once per position
+                tt.store(board.hash, *entry)
+        hash_move = None
+        if entry:
+            hash_move = entry[3]
+            if ply:
+                cut = tt_cutoff(entry, depth, alpha, beta, ply)
+                if cut is not None:
+                    return cut
+        if not ply and self.best_move:
+            # the root starts with the best move of the last iteration
+            hash_move = self.best_move
+
+        # selective search, only at nodes off the principal variation where we are not in check,
+        # and not around mate or known win scores, which the static evaluation knows nothing about
+        pv_node = beta - alpha > 1
+        futile = False
+        if not (pv_node or in_check) and abs(beta) < KNOWN_WIN:
+            static_eval = board.value()
+            # reverse futility pruning, so far above beta that even a loss of the margin would not change it
+            if self.reverse_futility and depth <= FUTILITY_DEPTH and static_eval - FUTILITY_MARGIN * depth >= beta:
+                return static_eval
+            # null move pruning, if passing the turn still holds beta then a real move would do even better
+            # skipped without pieces besides pawns, where passing may be the only way out of zugzwang
+            if self.null_move and null_allowed and depth >= 2 and static_eval >= beta and board.has_pieces():
+                reduction = 2 + depth // 4 + min((static_eval - beta) // 200, 1)
+                board.make_null_move()
+                score = -self.negamax(depth - 1 - reduction, -beta, -beta + 1, ply + 1, False)
+                board.unmake_null_move()
+                if self.stopped:
+                    return 0
+                if score >= beta:
+                    # a mate found after passing the turn is not to be trusted
+                    return beta if score >= MATE - MAX_PLY else score
+            # futility pruning, quiet moves cannot lift a score this far below alpha this close to the horizon
+            futile = self.futility and depth <= FUTILITY_DEPTH and static_eval + FUTILITY_MARGIN * depth <= alpha
+
+        alpha_orig = alpha
+        best_score, best_move = -INFINITE, None
+        killers = self.killers[ply]
+        searched = 0
+        for move in self.node_moves(hash_move, ply):
+            searched += 1
+            # promotions are not quiet either, though they may capture nothing
+            quiet = searched > 1 and move not in killers and not board.is_tactical(move)
+            board.make_move(move)
+            if futile and quiet and not board.is_check():
+                board.unmake_move()
+                continue
+            if searched == 1:
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # late move reductions, quiet moves ordered late are searched less deep, and again in full if they
+                # turn out better than expected
+                reduction = 0
+                if self.lmr and depth >= 3 and searched > LMR_MOVES and quiet and not in_check \
+                        and not board.is_check():
+                    reduction = lmr_reductions[min(depth, MAX_PLY - 1)][min(searched, MAX_MOVES - 1)]
+                # prove the move worse than the best one with a null window, and search it again if it is not
+                score = -self.negamax(depth - 1 - reduction, -alpha - 1, -alpha, ply + 1)
+                if reduction and score > alpha:
+                    score = -self.negamax(depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move()
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    self.update_pv(ply, move)
+                    if score >= beta:
+                        self.cutoff(move, depth, ply)
+                        break
+
+        if not searched:
+            # checkmate or stalemate
+            return -MATE + ply if in_check else 0
+        tt.store(board.hash, depth, score_to_tt(best_score, ply), bound(best_score, alpha_orig, beta), best_move)
+        return best_score
+
+    def quiescence(self, alpha, beta, ply):
+        # searches captures and promotions only, until the position is quiet enough to trust its evaluation
+        board = self.board
+        tt = self.tt
+        self.pv_length[ply] = 0
+        self.nodes += 1
+        if self.nodes % CHECK_NODES == 0 and self.clock.out_of_time():
+            self.stopped = True
+        if self.stopped:
+            return 0
+        entry = tt.probe(board.hash)
+        if entry:
+            cut = tt_cutoff(entry, 0, alpha, beta, ply)
+            if cut is not None:
+                return cut
+        if ply >= MAX_PLY - 1:
+            return board.value()
+
+        alpha_orig = alpha
+        in_check = board.is_check()
+        if self.bitbases and not in_check:
+            # positions in check are left to the search, so mates still score as mates
+            score = self.bitbases.probe(board, board.hash & SIDE_BIT)
+            if score is not None:
+                return score
+        if in_check:
+            # standing pat is not an option in check, every evasion is searched
+            stand_pat = best_score = -MATE + ply
+            moves = pick_moves(board, entry and entry[3])
+        else:
+            stand_pat = best_score = board.value()
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            moves = sorted(board.gen_legal_moves(True, False), key=lambda move: mvv_lva(board, move), reverse=True)
+
+        best_move = None
+        for move in moves:
+            if not in_check:
+                p, q = board.move_pieces(move)
+                if q:
+                    # delta pruning, even winning the piece for nothing would not bring the score up to alpha
+                    # pawns are left alone, as their captures may also promote
+                    if p != 'P' and stand_pat + values[q] + DELTA_MARGIN <= alpha:
+                        continue
+                    # captures that lose material once the exchange has played out are not searched
+                    if values[p] > values[q] and board.see(move) < 0:
+                        continue
+            board.make_move(move)
+            score = -self.quiescence(-beta, -alpha, ply + 1)
+            board.unmake_move()
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if score >= beta:
+                        break
+        tt.store(board.hash, 0, score_to_tt(best_score, ply), bound(best_score, alpha_orig, beta), best_move)
+        return best_score
+
+    def update_pv(self, ply, move):
+        # the line from this ply is the move followed by the line found below it
+        pv, child = self.pv[ply], self.pv[ply + 1]
+        length = max(self.pv_length[ply + 1], ply + 1)
+        pv[ply] = move
+        pv[ply + 1:length] = child[ply + 1:length]
+        self.pv_length[ply] = length
+
+    def node_moves(self, hash_move, ply):
+        # the moves of the current node, ordered with the help of the heuristics
+        board = self.board
+        slots = self.killers[ply]
+        moves = pick_moves(board, hash_move, (slots[0], slots[1], self.countermoves.get(board.last_move)),
+                           self.history)
+        if ply or not self.helper:
+            return moves
+        # helpers rotate the root moves after the first, so each starts on a different part of the tree
+        moves = list(moves)
+        shift = self.helper % (len(moves) - 1) if len(moves) > 1 else 0
+        return moves[:1] + moves[1 + shift:] + moves[1:1 + shift]
+
+    def cutoff(self, move, depth, ply):
+        # remembers a quiet move that refuted the current node
+        board = self.board
+        if board.is_tactical(move):
+            return
+        slots = self.killers[ply]
+        if slots[0] != move:
+            slots[0], slots[1] = move, slots[0]
+        self.history[move] += depth * depth
+        self.countermoves[board.last_move] = move
@@ -0,0 +1,645 @@
+from games.chess.zobrist import piece_keys, ep_keys, black_key, side_castling_keys
+from games.chess.evaluation import pst, phase_weights, piece_values, board_score, board_phase
+from games.chess.eval_cache import evaluate
+from games.chess.move_tables import step_moves, ray_moves, step_squares, ray_squares, pawn_push_moves, \
+    pawn_double_moves, pawn_capture_moves, pawn_capture_squares
+
+'''
+Mutable board for the search
+The 120 square mailbox is kept in a bytearray and changed in place by make_move, and put back by unmake_move
+from an undo stack, so a search node costs a couple of byte writes instead of rebuilding the board string
+The board is never rotated: white pieces are uppercase, black pieces lowercase, and the side to move is tracked
+Squares and moves use the same mailbox indices as Position does when white is to move
+'''
+
+WHITE, BLACK = 0, 1
+A1, H1, A8, H8 = 91, 98, 21, 28
+N, E, S, W = -10, 1, 10, -1
+
+# castling rights bits, the same as the bitboard representation
+WHITE_KING_SIDE, WHITE_QUEEN_SIDE, BLACK_KING_SIDE, BLACK_QUEEN_SIDE = 1, 2, 4, 8
+
+EMPTY = ord('.')
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = (ord(c) for c in 'PNBRQK')
+
+# color of each byte: WHITE, BLACK, or None for empty squares and padding
+colors = [None] * 128
+for _c in 'PNBRQK':
+    colors[ord(_c)] = WHITE
+    colors[ord(_c.lower())] = BLACK
+
+# piece byte for a white piece byte and a color
+pieces = [{ord(c): ord(c) for c in 'PNBRQK'}, {ord(c): ord(c.lower()) for c in 'PNBRQK'}]
+
+# pawns move north for white and south for black
+pawn_pushes = (N, S)
+# the rank pawns promote on
+pawn_promotion = ((A8, H8), (A1, H1))
+
+# move tables by piece byte, for both colors
+step_moves_by_piece = [None] * 128
+ray_moves_by_piece = [None] * 128
+for _c in 'NK':
+    step_moves_by_piece[ord(_c)] = step_moves_by_piece[ord(_c.lower())] = step_moves[_c]
+for _c in 'BRQ':
+    ray_moves_by_piece[ord(_c)] = ray_moves_by_piece[ord(_c.lower())] = ray_moves[_c]
+
+# Zobrist keys and piece-square scores by piece byte, and the keys of the pawn key, zero for every other piece
+z_table = [None] * 128
+pawn_z_table = [None] * 128
+pst_table = [None] * 128
+phase_table = [0] * 128
+for _c in piece_keys:
+    z_table[ord(_c)] = piece_keys[_c]
+    pawn_z_table[ord(_c)] = piece_keys[_c] if _c in 'Pp' else piece_keys['.']
+    pst_table[ord(_c)] = pst[_c]
+    phase_table[ord(_c)] = phase_weights.get(_c.upper(), 0)
+
+# exchange value by piece byte
+see_values = [0] * 128
+for _c, _v in piece_values.items():
+    see_values[ord(_c)] = see_values[ord(_c.lower())] = _v
+
+# castling rights that survive a move touching a square
+castling_masks = [0xF] * 120
+castling_masks[95] &= ~(WHITE_KING_SIDE | WHITE_QUEEN_SIDE)
+castling_masks[H1] &= ~WHITE_KING_SIDE
+castling_masks[A1] &= ~WHITE_QUEEN_SIDE
+castling_masks[25] &= ~(BLACK_KING_SIDE | BLACK_QUEEN_SIDE)
+castling_masks[H8] &= ~BLACK_KING_SIDE
+castling_masks[A8] &= ~BLACK_QUEEN_SIDE
+
+
+def least_valuable_attacker(squares, sq, by):
+    # the square of the cheapest piece of the given color attacking sq, or None
+    p = pieces[by]
+    for j in pawn_capture_squares[pawn_pushes[by ^ 1]][sq]:
+        if squares[j] == p[PAWN]:
+            return j
+    for j in step_squares['N'][sq]:
+        if squares[j] == p[KNIGHT]:
+            return j
+    # the first piece on each ray, diagonals and lines kept apart
+    firsts = []
+    for rays in ray_squares['B'][sq], ray_squares['R'][sq]:
+        first = []
+        for ray in rays:
+            for j in ray:
+                if squares[j] != EMPTY:
+                    first.append(j)
+                    break
+        firsts.append(first)
+    diagonal, line = firsts
+    for j in diagonal:
+        if squares[j] == p[BISHOP]:
+            return j
+    for j in line:
+        if squares[j] == p[ROOK]:
+            return j
+    for j in diagonal + line:
+        if squares[j] == p[QUEEN]:
+            return j
+    for j in step_squares['K'][sq]:
+        if squares[j] == p[KING]:
+            return j
+    return None
+
+
+def static_exchange(squares, move, us):
+    # static exchange evaluation of a move on a mailbox bytearray, with us the color of the moving piece
+    # both sides keep recapturing on the target square with their cheapest piece for as long as it pays,
+    # and the material the mover ends up with is returned
+    # pieces taken off the board uncover the sliders behind them; the board is put back before returning
+    i, j = move
+    gains = [see_values[squares[j]]]
+    removed = [(i, squares[i])]
+    attacker = squares[i]
+    squares[i] = EMPTY
+    side = us ^ 1
+    while True:
+        k = least_valuable_attacker(squares, j, side)
+        if k is None:
+            break
+        gains.append(see_values[attacker] - gains[-1])
+        attacker = squares[k]
+        removed.append((k, attacker))
+        squares[k] = EMPTY
+        side ^= 1
+    for k, p in removed:
+        squares[k] = p
+    # either side may stop capturing when going on would lose more
+    while len(gains) > 1:
+        last = gains.pop()
+        gains[-1] = -max(-gains[-1], last)
+    return gains[0]
+
+
+class SearchBoard:
+    """ A chess position that is changed in place
+    squares -- the 120 byte mailbox, white pieces uppercase
+    side -- the color to move, WHITE or BLACK
+    castling -- the castling rights, as a mask of the *_SIDE bits
+    ep -- the en passant square
+    score -- the packed piece-square-table evaluation, from white's point of view
+    phase -- the game phase, from 24 with all pieces on the board down to 0 with only kings and pawns
+    hash -- the 64-bit Zobrist hash, the same value Position computes for the position
+    pawn_hash -- the Zobrist key of the pawns alone, for the pawn hash
+    depth -- the number of moves made since the root
+    kings -- the square of the white and the black king, kept up to date by make_move and unmake_move
+    """
+
+    def __init__(self, board, side, castling, ep):
+        self.squares = bytearray(board, 'ascii')
+        self.side = side
+        self.castling = castling
+        self.ep = ep
+        self.score = board_score(board)
+        self.phase = board_phase(board)
+        self.depth = 0
+        self.kings = [self.squares.find(KING), self.squares.find(pieces[BLACK][KING])]
+        # undo stack, one tuple per made move
+        self.history = []
+        self.hash = self.z_hash()
+        self.pawn_hash = self.pawn_z_hash()
+
+    def z_hash(self):
+        # Zobrist Hash of board position, recomputed from scratch
+        h = ep_keys[self.ep] ^ side_castling_keys[self.side][self.castling]
+        if self.side:
+            h ^= black_key
+        for i, p in enumerate(self.squares):
+            if z_table[p]:
+                h ^= z_table[p][i]
+        return h
+
+    def pawn_z_hash(self):
+        # the pawn key, recomputed from scratch
+        h = 0
+        for i, p in enumerate(self.squares):
+            if pawn_z_table[p]:
+                h ^= pawn_z_table[p][i]
+        return h
+
+    def gen_moves(self, tactical=True, quiet=True):
+        # tactical - generate captures and promotions
+        # quiet - generate every other move
+        squares = self.squares
+        us = self.side
+        them = us ^ 1
+        pawn, king = pieces[us][PAWN], pieces[us][KING]
+        d = pawn_pushes[us]
+        pushes, doubles, captures = pawn_push_moves[d], pawn_double_moves[d], pawn_capture_moves[d]
+        first, last = pawn_promotion[us]
+        for i in range(A8, H1 + 1):
+            # i - initial position index
+            # p - piece code
+            p = squares[i]
+            # if the piece doesn't belong to us, skip it
+            if colors[p] != us: continue
+            if p == pawn:
+                # Pawn move, double move and capture
+                move = pushes[i]
+                if squares[move[1]] == EMPTY:
+                    if first <= move[1] <= last:
+                        if tactical: yield move
+                    elif quiet:
+                        yield move
+                        move = doubles[i]
+                        if move and squares[move[1]] == EMPTY: yield move
+                if tactical:
+                    for move in captures[i]:
+                        q = squares[move[1]]
+                        if colors[q] == them or (move[1] == self.ep and q == EMPTY): yield move
+            elif step_moves_by_piece[p]:
+                # Non-sliders stay off friendly pieces
+                for move in step_moves_by_piece[p][i]:
+                    q = squares[move[1]]
+                    if q == EMPTY:
+                        if quiet: yield move
+                    elif tactical and colors[q] == them:
+                        yield move
+                if p == king and quiet:
+                    # Castling, the king may not leave, cross or land on an attacked square
+                    king_side, queen_side = (WHITE_KING_SIDE, WHITE_QUEEN_SIDE) if us == WHITE \
+                        else (BLACK_KING_SIDE, BLACK_QUEEN_SIDE)
+                    if self.castling & king_side and squares[i + E] == EMPTY and squares[i + 2 * E] == EMPTY \
+                            and not any(self.is_attacked(k, them) for k in (i, i + E, i + 2 * E)):
+                        yield (i, i + 2 * E)
+                    if self.castling & queen_side and squares[i + W] == EMPTY and squares[i + 2 * W] == EMPTY \
+                            and squares[i + 3 * W] == EMPTY \
+                            and not any(self.is_attacked(k, them) for k in (i, i + W, i + 2 * W)):
+                        yield (i, i + 2 * W)
+            else:
+                for ray in ray_moves_by_piece[p][i]:
+                    for move in ray:
+                        # slide over empty squares, and stop on the first piece, capturing it if it is theirs
+                        q = squares[move[1]]
+                        if q == EMPTY:
+                            if quiet: yield move
+                            continue
+                        if tactical and colors[q] == them: yield move
+                        break
+
+    def pins_and_checks(self):
+        # looks outward from our king once, returning
+        # checkers - the number of pieces giving check
+        # evasions - the squares a piece other than the king can move to while in a single check
+        # pins - pinned square -> the squares that piece may move to without uncovering the king
+        squares = self.squares
+        us = self.side
+        king = self.kings[us]
+        p = pieces[us ^ 1]
+        checkers, evasions, pins = 0, None, {}
+        for j in pawn_capture_squares[pawn_pushes[us]][king]:
+            if squares[j] == p[PAWN]:
+                checkers, evasions = checkers + 1, (j,)
+        for j in step_squares['N'][king]:
+            if squares[j] == p[KNIGHT]:
+                checkers, evasions = checkers + 1, (j,)
+        for sliders, rays in ((p[BISHOP], p[QUEEN]), ray_squares['B'][king]), ((p[ROOK], p[QUEEN]), ray_squares['R'][king]):
+            for ray in rays:
+                pinned = None
+                for n, j in enumerate(ray):
+                    q = squares[j]
+                    if q == EMPTY: continue
+                    if colors[q] == us:
+                        # the first of our pieces on the ray might be pinned, a second one shields it
+                        if pinned is not None: break
+                        pinned = j
+                        continue
+                    if q in sliders:
+                        if pinned is None:
+                            checkers, evasions = checkers + 1, ray[:n + 1]
+                        else:
+                            pins[pinned] = ray[:n + 1]
+                    break
+        return checkers, evasions, pins
+
+    def gen_legal_moves(self, tactical=True, quiet=True, checks=None):
+        # the pseudo-legal moves, filtered by the checks and pins of our king, so no move has to be made to be tested
+        # checks - the result of pins_and_checks, when the caller generates the moves in several batches
+        squares = self.squares
+        us = self.side
+        them = us ^ 1
+        king = self.kings[us]
+        if king < 0:
+            yield from self.gen_moves(tactical, quiet)
+            return
+        checkers, evasions, pins = checks or self.pins_and_checks()
+        pawn = pieces[us][PAWN]
+        for move in self.gen_moves(tactical, quiet):
+            i, j = move
+            if i == king:
+                # castling has been checked against attacks already, other king moves are tested
+                # with the king lifted off the board so it cannot hide from a slider behind itself
+                if abs(j - i) == 2:
+                    yield move
+                    continue
+                squares[i] = EMPTY
+                attacked = self.is_attacked(j, them)
+                squares[i] = pieces[us][KING]
+                if not attacked: yield move
+                continue
+            if checkers > 1: continue
+            if j == self.ep and squares[i] == pawn and squares[j] == EMPTY:
+                # en passant takes two pieces off one rank, so test it on the board
+                k = j - pawn_pushes[us]
+                q = squares[k]
+                squares[i], squares[j], squares[k] = EMPTY, pawn, EMPTY
+                attacked = self.is_attacked(king, them)
+                squares[i], squares[j], squares[k] = pawn, EMPTY, q
+                if not attacked: yield move
+                continue
+            if checkers and j not in evasions: continue
+            if i in pins and j not in pins[i]: continue
+            yield move
+
+    def is_legal_quiet(self, move, checks):
+        # returns if a move from elsewhere in the tree, such as a killer, is a legal quiet move here,
+        # without generating the moves of the position
+        # checks - the result of pins_and_checks
+        i, j = move
+        squares = self.squares
+        us = self.side
+        p = squares[i]
+        if colors[p] != us or squares[j] != EMPTY:
+            return False
+        if p == pieces[us][PAWN]:
+            d = pawn_pushes[us]
+            push = pawn_push_moves[d][i]
+            if move == push:
+                first, last = pawn_promotion[us]
+                if first <= j <= last: return False
+            elif move != pawn_double_moves[d][i] or squares[push[1]] != EMPTY:
+                return False
+        elif step_moves_by_piece[p]:
+            # castling is left to the quiet moves of the position
+            if move not in step_moves_by_piece[p][i]: return False
+        else:
+            for ray in ray_moves_by_piece[p][i]:
+                if move in ray:
+                    if any(squares[k] != EMPTY for _, k in ray[:ray.index(move)]): return False
+                    break
+            else:
+                return False
+        king = self.kings[us]
+        if king < 0:
+            return True
+        checkers, evasions, pins = checks
+        if i == king:
+            squares[i] = EMPTY
+            attacked = self.is_attacked(j, us ^ 1)
+            squares[i] = p
+            return not attacked
+        if checkers > 1 or checkers and j not in evasions: return False
+        return i not in pins or j in pins[i]
+
+    def make_move(self, move):
+        # i - original position index
+        # j - final position index
+        i, j = move
+        squares = self.squares
+        us = self.side
+        # p - piece code of moving piece
+        # q - piece code at final square
+        p, q = squares[i], squares[j]
+        # remember everything that cannot be recomputed when the move is taken back
+        self.history.append((move, p, q, self.castling, self.ep, self.hash, self.score, self.phase, self.pawn_hash))
+        h = self.hash ^ ep_keys[self.ep] ^ side_castling_keys[us][self.castling] ^ black_key
+        ph = self.pawn_hash ^ pawn_z_table[p][i] ^ pawn_z_table[p][j] ^ pawn_z_table[q][j]
+        score = self.score + pst_table[p][j] - pst_table[p][i] - pst_table[q][j]
+        self.phase -= phase_table[q]
+        # perform the move
+        squares[j] = p
+        squares[i] = EMPTY
+        h ^= z_table[p][i] ^ z_table[p][j] ^ z_table[q][j]
+        ep = 0
+        if p == pieces[us][PAWN]:
+            if j == self.ep and q == EMPTY:
+                # en passant capture removes the pawn behind the target square
+                k = j - pawn_pushes[us]
+                score -= pst_table[squares[k]][k]
+                h ^= z_table[squares[k]][k]
+                ph ^= pawn_z_table[squares[k]][k]
+                squares[k] = EMPTY
+            elif abs(j - i) == 2 * S:
+                ep = (i + j) // 2
+            elif pawn_promotion[us][0] <= j <= pawn_promotion[us][1]:
+                # Promote the pawn to Queen
+                queen = pieces[us][QUEEN]
+                squares[j] = queen
+                score += pst_table[queen][j] - pst_table[p][j]
+                h ^= z_table[p][j] ^ z_table[queen][j]
+                ph ^= pawn_z_table[p][j]
+                self.phase += phase_table[queen]
+        elif p == pieces[us][KING]:
+            self.kings[us] = j
+            if abs(j - i) == 2:
+                # Castling Logic, the rook jumps over the king
+                rook = pieces[us][ROOK]
+                r, k = (i + 3 * E, i + E) if j > i else (i + 4 * W, i + W)
+                squares[r] = EMPTY
+                squares[k] = rook
+                score += pst_table[rook][k] - pst_table[rook][r]
+                h ^= z_table[rook][r] ^ z_table[rook][k]
+        self.castling &= castling_masks[i] & castling_masks[j]
+        self.ep = ep
+        self.side = us ^ 1
+        self.hash = h ^ ep_keys[ep] ^ side_castling_keys[us ^ 1][self.castling]
+        self.score = score
+        self.pawn_hash = ph
+        self.depth += 1
+
+    def make_null_move(self):
+        # passes the turn to the other side, for null move pruning
+        us = self.side
+        self.history.append((None, EMPTY, EMPTY, self.castling, self.ep, self.hash, self.score, self.phase,
+                             self.pawn_hash))
+        self.hash ^= ep_keys[self.ep] ^ black_key ^ side_castling_keys[us][self.castling] \
+            ^ side_castling_keys[us ^ 1][self.castling]
+        self.ep = 0
+        self.side = us ^ 1
+        self.depth += 1
+
+    def unmake_null_move(self):
+        move, p, q, self.castling, self.ep, self.hash, self.score, self.phase, self.pawn_hash = self.history.pop()
+        self.side ^= 1
+        self.depth -= 1
+
+    def unmake_move(self):
+        (i, j), p, q, self.castling, ep, self.hash, self.score, self.phase, self.pawn_hash = self.history.pop()
+        squares = self.squares
+        self.side ^= 1
+        self.ep = ep
+        self.depth -= 1
+        us = self.side
+        squares[i] = p
+        squares[j] = q
+        if p == pieces[us][PAWN]:
+            if j == ep and q == EMPTY:
+                squares[j - pawn_pushes[us]] = pieces[us ^ 1][PAWN]
+        elif p == pieces[us][KING]:
+            self.kings[us] = i
+            if abs(j - i) == 2:
+                r, k = (i + 3 * E, i + E) if j > i else (i + 4 * W, i + W)
+                squares[r] = pieces[us][ROOK]
+                squares[k] = EMPTY
+
+    def move_pieces(self, move):
+        # the moving piece and the piece the move would capture, if any, as uppercase codes
+        i, j = move
+        p, q = self.squares[i], self.squares[j]
+        if q != EMPTY:
+            return chr(p).upper(), chr(q).upper()
+        if j == self.ep and p in (PAWN, PAWN + 32):
+            return 'P', 'P'
+        return chr(p).upper(), None
+
+    def is_tactical(self, move):
+        # returns if the move captures or promotes, the moves the search does not treat as quiet
+        i, j = move
+        if self.squares[j] != EMPTY:
+            return True
+        if self.squares[i] not in (PAWN, PAWN + 32):
+            return False
+        first, last = pawn_promotion[self.side]
+        return first <= j <= last or j == self.ep
+
+    def see(self, move):
+        # the material the move wins once the exchange on its target square has played out
+        i, j = move
+        if j == self.ep and self.squares[j] == EMPTY and self.squares[i] in (PAWN, PAWN + 32):
+            return see_values[PAWN]
+        return static_exchange(self.squares, move, self.side)
+
+    @property
+    def last_move(self):
+        # the move that led to this position, or None at the root
+        return self.history[-1][0] if self.history else None
+
+    @property
+    def captured(self):
+        # the piece that was captured as the result of the last move
+        if not self.history or not self.history[-1][0]:
+            return None
+        (i, j), p, q, castling, ep, h, score, phase, pawn_hash = self.history[-1]
+        if q != EMPTY:
+            return chr(q).upper()
+        if j == ep and p in (PAWN, PAWN + 32):
+            return 'P'
+        return None
+
+    def value(self):
+        # the tapered evaluation for the side to move, pawn structure included
+        return evaluate(self, self.score, self.side)
+
+    def pawn_masks(self):
+        # the white and the black pawns as bitboards, a1 = 0
+        white = black = 0
+        for i, p in enumerate(self.squares):
+            if p == PAWN:
+                white |= 1 << (9 - i // 10) * 8 + i % 10 - 1
+            elif p == PAWN + 32:
+                black |= 1 << (9 - i // 10) * 8 + i % 10 - 1
+        return white, black
+
+    def king_squares(self):
+        # the squares of the white and the black king, a1 = 0, or -1 for a missing king
+        return tuple((9 - i // 10) * 8 + i % 10 - 1 if i >= 0 else -1 for i in self.kings)
+
+    def is_attacked(self, sq, by):
+        # returns if the square is attacked by any piece of the given color
+        squares = self.squares
+        p = pieces[by]
+        # pawns attack against their direction of travel
+        for j in pawn_capture_squares[pawn_pushes[by ^ 1]][sq]:
+            if squares[j] == p[PAWN]:
+                return True
+        for j in step_squares['N'][sq]:
+            if squares[j] == p[KNIGHT]:
+                return True
+        for j in step_squares['K'][sq]:
+            if squares[j] == p[KING]:
+                return True
+        for sliders, rays in ((p[BISHOP], p[QUEEN]), ray_squares['B'][sq]), ((p[ROOK], p[QUEEN]), ray_squares['R'][sq]):
+            for ray in rays:
+                for j in ray:
+                    if squares[j] != EMPTY:
+                        if squares[j] in sliders:
+                            return True
+                        break
+        return False
+
+    def has_pieces(self):
+        # returns if the side to move has anything besides pawns and the king, when it does a null move is safe
+        # from zugzwang
+        squares = self.squares
+        p = pieces[self.side]
+        return any(squares.find(p[piece]) >= 0 for piece in (KNIGHT, BISHOP, ROOK, QUEEN))
+
+    def piece_list(self, limit):
+        # returns (piece, square) of every piece on the board, white uppercase and a1 = 0, or None for more than limit
+        squares = self.squares
+        if 64 - squares.count(EMPTY) > limit:
+            return None
+        return [(chr(p), (9 - i // 10) * 8 + i % 10 - 1) for i, p in enumerate(squares) if colors[p] is not None]
+
+    def is_check(self):
+        # returns if the side to move is in check
+        king = self.kings[self.side]
+        return king >= 0 and self.is_attacked(king, self.side ^ 1)
+
+
+class PositionStack:
+    """ The make/unmake interface of SearchBoard over an immutable Position or BitPosition
+    Every made move pushes the position returned by move, and unmake_move pops it again
+    moves -- the moves made since the root, for last_move
+    """
+
+    def __init__(self, position):
+        self.positions = [position]
+        self.moves = []
+
+    def gen_moves(self):
+        return self.positions[-1].gen_moves()
+
+    def gen_legal_moves(self, tactical=True, quiet=True, checks=None):
+        return self.positions[-1].gen_legal_moves(tactical, quiet, checks)
+
+    def pins_and_checks(self):
+        return self.positions[-1].pins_and_checks()
+
+    def is_legal_quiet(self, move, checks):
+        return self.positions[-1].is_legal_quiet(move, checks)
+
+    def move_pieces(self, move):
+        return self.positions[-1].move_pieces(move)
+
+    def is_tactical(self, move):
+        return self.positions[-1].is_tactical(move)
+
+    def see(self, move):
+        return self.positions[-1].see(move)
+
+    def make_move(self, move):
+        self.positions.append(self.positions[-1].move(move))
+        self.moves.append(move)
+
+    def unmake_move(self):
+        self.positions.pop()
+        self.moves.pop()
+
+    def make_null_move(self):
+        self.positions.append(self.positions[-1].nullmove())
+        self.moves.append(None)
+
+    def unmake_null_move(self):
+        self.unmake_move()
+
+    @property
+    def hash(self):
+        return self.positions[-1].hash
+
+    @property
+    def depth(self):
+        return self.positions[-1].depth
+
+    @property
+    def last_move(self):
+        return self.moves[-1] if self.moves else None
+
+    @property
+    def captured(self):
+        return self.positions[-1].captured
+
+    def value(self):
+        return self.positions[-1].value()
+
+    def has_pieces(self):
+        return self.positions[-1].has_pieces()
+
+    def piece_list(self, limit):
+        return self.positions[-1].piece_list(limit)
+
+    def is_check(self):
+        return self.positions[-1].is_check()
+
+
+def fen_to_search_board(fen_string):
+    # generate a SearchBoard from a FEN string
+    board, player, castling, enpassant, halfmove, move = fen_string.split()
+    rows = [' ' + ''.join('.' * int(piece) if piece.isdigit() else piece for piece in row) + '\n'
+            for row in board.split('/')]
+    board_out = ''.join(['         \n         \n'] + rows + ['         \n         \n'])
+
+    rights = 0
+    if 'K' in castling: rights |= WHITE_KING_SIDE
+    if 'Q' in castling: rights |= WHITE_QUEEN_SIDE
+    if 'k' in castling: rights |= BLACK_KING_SIDE
+    if 'q' in castling: rights |= BLACK_QUEEN_SIDE
+
+    ep = 0
+    if enpassant != '-':
+        ep = A1 + ord(enpassant[0]) - ord('a') - 10 * (int(enpassant[1]) - 1)
+
+    return SearchBoard(board_out, WHITE if player == 'w' else BLACK, rights, ep)
@@ -0,0 +1,113 @@
+import pickle
+from multiprocessing import Process, Queue, RawValue
+from games.chess.search import Searcher
+from games.chess.bitbases import Bitbases, default_directory
+from games.chess.transposition import TranspositionTable
+
+'''
+Lazy SMP
+Helper processes search the same root as the main search, at the same time, sharing one transposition table
+in shared memory and nothing else; whatever one of them finds is picked up by the others through the table
+Only the move of the main search is played, the helpers are there to fill the table ahead of it
+Helpers differ from the main search in depth and root move order, so they do not all search the same nodes
+
+Processes are used rather than threads as the search is pure Python and would otherwise share one interpreter lock
+The helpers are started once and wait between searches, a search is stopped by bumping the shared search id
+'''
+
+
+class HelperClock:
+    """ The clock of a helper search, which runs until the main search moves on to another search id
+    search_id -- the shared id of the current search
+    own_id -- the id of the search this helper is running
+    """
+
+    def __init__(self, search_id, own_id):
+        self.search_id = search_id
+        self.own_id = own_id
+
+    def start(self):
+        pass
+
+    def out_of_time(self):
+        return self.search_id.value != self.own_id
+
+    def stop(self):
+        self.own_id = None
+
+    def iteration_done(self, best_move):
+        return not self.out_of_time()
+
+
+def helper_main(index, name, size_mb, tasks, results, search_id, bitbases):
+    # the loop of a helper process, runs one search for each task until it is sent None
+    # bitbases -- the directory of the endgame bitbases, each helper maps its own
+    tt = TranspositionTable.attach(name, size_mb)
+    # the helpers probe the bitbases like the main search, so they do not fill the shared table with
+    # heuristic scores of positions the bitbases know to be drawn
+    bitbases = Bitbases(bitbases)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            board, generation, own_id, options = pickle.loads(task)
+            # the generation is bumped by the search, in step with the main process
+            tt.generation = generation
+            searcher = Searcher(board, tt, clock=HelperClock(search_id, own_id), helper=index, bitbases=bitbases,
+                                **options)
+            try:
+                searcher.iterate()
+            finally:
+                # the main process waits for every helper to report, even one that failed
+                results.put(searcher.nodes)
+    finally:
+        bitbases.close()
+        tt.close()
+
+
+class LazySMP:
+    """ A main search helped by processes searching the same position
+    threads -- the number of processes searching, including this one
+    tt -- the shared transposition table, the main search has to use it too
+    helpers -- the helper processes
+    nodes -- the nodes searched by all processes in the last search
+    """
+
+    def __init__(self, threads, size_mb=16, bitbases=default_directory):
+        self.threads = threads
+        self.tt = TranspositionTable.shared(size_mb)
+        self.search_id = RawValue('l', 0)
+        self.results = Queue()
+        self.tasks = []
+        self.helpers = []
+        for index in range(1, threads):
+            tasks = Queue()
+            helper = Process(target=helper_main, name='helper-{}'.format(index), daemon=True,
+                             args=(index, self.tt.name, size_mb, tasks, self.results, self.search_id, bitbases))
+            helper.start()
+            self.tasks.append(tasks)
+            self.helpers.append(helper)
+        self.nodes = 0
+
+    def search(self, searcher, options):
+        # runs the main searcher with the helpers behind it, returns its move once every helper has stopped
+        # options -- the keyword arguments of the Searcher, for the helpers to search with the same settings
+        self.search_id.value += 1
+        # the board is pickled now, before the main search starts moving on it
+        task = pickle.dumps((searcher.board, self.tt.generation, self.search_id.value, options))
+        for tasks in self.tasks:
+            tasks.put(task)
+        try:
+            move = searcher.iterate()
+        finally:
+            self.search_id.value += 1
+            self.nodes = searcher.nodes + sum(self.results.get() for _ in self.helpers)
+        return move
+
+    def close(self):
+        for tasks in self.tasks:
+            tasks.put(None)
+        for helper in self.helpers:
+            helper.join()
+        self.tt.close(unlink=True)
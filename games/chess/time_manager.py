@@ -0,0 +1,86 @@
+from timeit import default_timer as timer
+
+'''
+Time management
+The remaining clock is split over the moves still to be played into two budgets for each move:
+the soft budget, after which no new iteration is started, and the hard budget, after which the search is stopped
+in the middle of an iteration and the best move of the last one is played
+
+The soft budget is stretched while the best move keeps changing between iterations, as the search has not made
+up its mind yet, and shrinks while it stays the same, so easy positions do not use up the clock
+'''
+
+# the server reports the clock in nanoseconds
+NS = 10 ** 9
+# the remaining clock is spread over the moves left before the turn limit, but never fewer or more than these
+MIN_MOVES_TO_GO = 10
+MAX_MOVES_TO_GO = 30
+# seconds kept back on every move for the network and the server
+OVERHEAD = 0.05
+# the least a move is given, so a nearly empty clock still gets a move out
+MIN_BUDGET = 0.01
+# the hard budget is this many times the soft one, but never more than this share of the clock
+HARD_RATIO = 4
+HARD_SHARE = 0.25
+# the soft budget scale grows by this much every time the best move changes, up to the most
+INSTABILITY = 0.5
+MAX_SCALE = 2.5
+# and decays by this factor every iteration the best move stays the same, down to the least
+STABILITY = 0.85
+MIN_SCALE = 0.5
+
+
+class TimeManager:
+    """ The time budget of one move
+    soft -- seconds after which no new iteration is started, before scaling
+    hard -- seconds after which the search is stopped
+    scale -- how much of the soft budget may be used, following the stability of the best move
+    """
+
+    def __init__(self, soft, hard):
+        self.soft = min(soft, hard)
+        self.hard = hard
+        self.scale = 1.0
+        self.started = None
+        self.last_best = None
+
+    @classmethod
+    def from_clock(cls, time_remaining, turn, max_turns):
+        # budgets from the remaining clock in ns, the current turn and the turn limit of the game
+        remaining = max(time_remaining / NS - OVERHEAD, MIN_BUDGET)
+        # turns count both players, only every other one is ours
+        moves_left = (max_turns - turn + 1) // 2
+        moves_to_go = max(MIN_MOVES_TO_GO, min(moves_left, MAX_MOVES_TO_GO))
+        soft = remaining / moves_to_go
+        hard = max(min(soft * HARD_RATIO, remaining * HARD_SHARE), MIN_BUDGET)
+        return cls(soft, hard)
+
+    @classmethod
+    def unlimited(cls):
+        # a search that only ends when it is stopped, as when pondering
+        return cls(float('inf'), float('inf'))
+
+    def start(self):
+        self.started = timer()
+        self.scale = 1.0
+        self.last_best = None
+
+    def elapsed(self):
+        return timer() - self.started
+
+    def out_of_time(self):
+        # the hard limit, checked during the search
+        return self.elapsed() >= self.hard
+
+    def stop(self):
+        # runs the clock out, the search stops at its next look at it
+        self.soft = self.hard = 0
+
+    def iteration_done(self, best_move):
+        # called after every finished iteration, returns whether there is time for another one
+        if self.last_best is not None and best_move != self.last_best:
+            self.scale = min(self.scale + INSTABILITY, MAX_SCALE)
+        else:
+            self.scale = max(self.scale * STABILITY, MIN_SCALE)
+        self.last_best = best_move
+        return self.elapsed() < min(self.soft * self.scale, self.hard)
@@ -0,0 +1,165 @@
+from array import array
+from multiprocessing import shared_memory
+
+'''
+Fixed size transposition table
+Entries are packed into two 64-bit words (the full Zobrist key and a data word) inside one preallocated array,
+so the memory used is decided once, by the size in MB, and never grows during a game
+
+Entries are grouped in buckets of two:
+slot 0 is depth-preferred, it only gives way to deeper searches or to entries left over from an older search,
+and a shallower search of the same position only replaces it with an exact score
+slot 1 is always-replace, it takes whatever slot 0 turns down
+Every search bumps the generation counter, so entries survive across turns but are aged out as they go stale
+
+The table can live in a shared memory block, so the processes of a parallel search all read and write one table
+without locks: the key word is stored XORed with the data word, and an entry only matches if the two words still
+XOR back to the key, so an entry torn by two processes writing it at once reads as a miss rather than as bad data
+
+Data word layout:
+bits 0 - 13   best move, from square << 7 | to square, 0 for none
+bits 16 - 23  depth
+bits 24 - 25  bound flag
+bits 26 - 31  generation
+bits 32 - 63  score, offset to be unsigned
+'''
+
+EXACT, LOWER, UPPER = 1, 2, 3
+
+ENTRY_BYTES = 16
+SCORE_OFFSET = 1 << 31
+SCORE_MAX = SCORE_OFFSET - 1
+GENERATIONS = 64
+
+
+def pack_move(move):
+    return move[0] << 7 | move[1] if move else 0
+
+
+def unpack_move(code):
+    return (code >> 7, code & 127) if code else None
+
+
+def unpack_data(data):
+    # (depth, score, flag, move) of a data word
+    return (data >> 16) & 0xFF, (data >> 32) - SCORE_OFFSET, (data >> 24) & 3, unpack_move(data & 0x3FFF)
+
+
+def pack_data(depth, score, flag, move, generation=0):
+    depth = max(0, min(depth, 0xFF))
+    score = int(max(-SCORE_MAX, min(SCORE_MAX, score)))
+    return pack_move(move) | depth << 16 | flag << 24 | generation << 26 | (score + SCORE_OFFSET) << 32
+
+
+def table_buckets(size_mb):
+    # the most buckets, a power of two, that fit in the size
+    buckets = 1
+    while buckets * 2 * ENTRY_BYTES * 2 <= size_mb * (1 << 20):
+        buckets *= 2
+    return buckets
+
+
+class TranspositionTable:
+    """ A bounded, bucketed transposition table
+    size_mb -- the memory the table may use, in megabytes
+    shm -- the shared memory block holding the table, None for a table private to this process
+    """
+
+    def __init__(self, size_mb=16, shm=None):
+        buckets = table_buckets(size_mb)
+        self.size_mb = size_mb
+        self.mask = buckets - 1
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.shm = shm
+        # two words per entry, two entries per bucket
+        if shm:
+            self.table = shm.buf[:buckets * 2 * ENTRY_BYTES].cast('Q')
+        else:
+            self.table = array('Q', bytes(buckets * 2 * ENTRY_BYTES))
+
+    @classmethod
+    def shared(cls, size_mb=16):
+        # a new, empty table in shared memory, for other processes to attach to by its name
+        # new shared memory is zero filled, which reads as an empty table
+        shm = shared_memory.SharedMemory(create=True, size=table_buckets(size_mb) * 2 * ENTRY_BYTES)
+        return cls(size_mb, shm)
+
+    @classmethod
+    def attach(cls, name, size_mb):
+        # the shared table created by another process
+        return cls(size_mb, shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self):
+        return self.shm.name if self.shm else None
+
+    def close(self, unlink=False):
+        # lets go of the shared memory, the process that created it also unlinks it
+        if self.shm:
+            self.table.release()
+            self.shm.close()
+            if unlink:
+                self.shm.unlink()
+            self.shm = None
+
+    def new_search(self):
+        # called once per search, so older entries can be told apart
+        self.generation = (self.generation + 1) % GENERATIONS
+
+    def clear(self):
+        if self.shm:
+            self.shm.buf[:len(self.table) * 8] = bytes(len(self.table) * 8)
+        else:
+            self.table = array('Q', bytes(len(self.table) * 8))
+
+    def probe(self, key):
+        # returns (depth, score, flag, move) for the position, or None
+        self.probes += 1
+        table = self.table
+        index = (key & self.mask) << 2
+        for slot in (index, index + 2):
+            data = table[slot + 1]
+            if table[slot] ^ data == key:
+                if data:
+                    self.hits += 1
+                    return ((data >> 16) & 0xFF, (data >> 32) - SCORE_OFFSET, (data >> 24) & 3,
+                            unpack_move(data & 0x3FFF))
+        return None
+
+    def entries(self, min_depth=0):
+        # yields (key, depth, score, flag, move) of every entry searched at least min_depth deep
+        table = self.table
+        for slot in range(0, len(table), 2):
+            data = table[slot + 1]
+            if data and (data >> 16) & 0xFF >= min_depth:
+                yield (table[slot] ^ data,) + unpack_data(data)
+
+    def store(self, key, depth, score, flag, move=None):
+        table = self.table
+        index = (key & self.mask) << 2
+        depth = max(0, min(depth, 0xFF))
+        score = int(max(-SCORE_MAX, min(SCORE_MAX, score)))
+        data = table[index + 1]
+        if table[index] ^ data != key and table[index + 2] ^ table[index + 3] == key:
+            slot = index + 2
+        else:
+            slot = index
+            # keep a deeper entry from this search in the depth-preferred slot
+            if data and (data >> 26) & 0x3F == self.generation and (data >> 16) & 0xFF > depth:
+                if table[index] ^ data != key:
+                    slot = index + 2
+                elif flag != EXACT:
+                    # a shallower bound on the same position, such as a quiescence result, is worth less
+                    return
+        old = table[slot + 1]
+        if not move and table[slot] ^ old == key:
+            # keep the old best move when a search of the same position did not find one
+            code = old & 0x3FFF
+        else:
+            code = pack_move(move)
+        data = code | depth << 16 | flag << 24 | self.generation << 26 | (score + SCORE_OFFSET) << 32
+        table[slot] = key ^ data
+        table[slot + 1] = data
+
@@ -0,0 +1,61 @@
+from random import Random
+
+'''
+Zobrist keys shared by the board representations
+Keys are laid out on the 120 square mailbox, as white sees the board, and drawn from a fixed seed
+so that every process (and every game) agrees on the hash of a position
+
+Bit 0 of a hash is the side to move: black_key is the only key with that bit set
+The mailbox Position is rotated to the side to move after every move, and reads the bit to pick
+the keys of the frame it is in, so every representation hashes a position the same way
+'''
+
+_random = Random(0x5A0B1257)
+
+A1, H1, A8, H8 = 91, 98, 21, 28
+SIDE_BIT = 1
+
+
+def _key():
+    return _random.getrandbits(64) & ~SIDE_BIT
+
+
+# piece code -> key for each of the 120 squares, zero on padding squares and for empty squares
+piece_keys = {'.': [0] * 120}
+for _p in 'PNBRQKpnbrqk':
+    piece_keys[_p] = [_key() if 0 < i % 10 < 9 and A8 <= i <= H1 else 0 for i in range(120)]
+
+# the keys for a board rotated to black's point of view, where black pieces are uppercase and square i is 119 - i
+rotated_piece_keys = {p: [piece_keys[p.swapcase()][119 - i] for i in range(120)] for p in piece_keys}
+# piece keys by the side to move, for boards that are rotated to the side to move
+frame_keys = (piece_keys, rotated_piece_keys)
+
+# en passant keys, symmetric under rotation, with square 0 meaning no en passant square
+# only one side can have an en passant square, and the side key tells which
+ep_keys = [0] * 120
+for _i in range(A8, 60):
+    ep_keys[_i] = ep_keys[119 - _i] = _key()
+
+# castling keys, indexed by the rights relative to the side to move:
+# bit 0 and 1 are the mover's west/east rights (wc), bit 2 and 3 the opponent's (bc)
+castling_keys = [0] + [_key() for _ in range(15)]
+
+# toggled whenever the side to move changes
+black_key = _random.getrandbits(64) | SIDE_BIT
+
+
+def castling_index(wc, bc):
+    return wc[0] | wc[1] << 1 | bc[0] << 2 | bc[1] << 3
+
+
+def swap_castling_index(index):
+    # the castling index of the same rights seen from the other side
+    return index >> 2 | (index & 3) << 2
+
+
+# castling keys for an absolute rights mask (bit 0 white king side, bit 1 white queen side,
+# bit 2 black king side, bit 3 black queen side), for white and for black to move
+side_castling_keys = (
+    [castling_keys[castling_index((bool(c & 2), bool(c & 1)), (bool(c & 4), bool(c & 8)))] for c in range(16)],
+    [castling_keys[castling_index((bool(c & 4), bool(c & 8)), (bool(c & 2), bool(c & 1)))] for c in range(16)]
+)
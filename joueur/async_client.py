@@ -0,0 +1,155 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+import joueur.client as client
+import joueur.error_code as error_code
+import joueur.ansi_color_coder as color
+
+'''
+Asyncio transport for the client
+The socket is served by an asyncio event loop in a network thread, so reading, framing and decoding what the
+server sends, merging deltas into the game and writing commands all go on while the AI thinks
+The AI itself runs in an executor of one thread, which gets the auto handled events that call into the AI
+(game updates, orders, invalid commands and the end of the game) one at a time and in the order they arrived
+
+The synchronous client API works on top of it: run_on_server sends from the AI thread and waits on the future of
+its call, which the network thread resolves once the "ran" reply arrives
+Until play is called every other event goes to a queue that wait_for_event reads, so the lobby, the first deltas
+and the start of the game are handled on the calling thread just as in the synchronous mode
+'''
+
+# events whose handlers call into the AI, run in the executor
+AI_EVENTS = ('order', 'invalid', 'over')
+# seconds a disconnect waits for written data to go out
+CLOSE_TIMEOUT = 1.0
+
+
+class _Protocol(asyncio.Protocol):
+    """ Passes the data and the loss of the connection on to the transport
+    owner -- the AsyncTransport of the connection
+    """
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    def data_received(self, data):
+        self.owner.received(data)
+
+    def connection_lost(self, exc):
+        self.owner.lost(exc)
+
+
+class AsyncTransport:
+    """ The connection to the server in asyncio mode
+    loop -- the event loop, run by the network thread
+    stream -- the asyncio transport of the socket
+    reader -- splits the received bytes into events
+    events -- the events that arrived before play was called, for wait_for_event
+    executor -- the single thread the AI runs in
+    playing -- whether play was called, from then on the network thread handles the events itself
+    closed -- set once the connection is gone
+    """
+
+    def __init__(self, hostname, port, print_io=False):
+        self.print_io = print_io
+        self.reader = client._FrameReader()
+        self.events = Queue()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ai')
+        self.playing = False
+        self.closing = False
+        self.closed = threading.Event()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='network', daemon=True)
+        self.thread.start()
+        connecting = asyncio.run_coroutine_threadsafe(
+            self.loop.create_connection(lambda: _Protocol(self), hostname, port), self.loop)
+        # connection errors are raised here, in the calling thread
+        self.stream, _ = connecting.result()
+
+    def send(self, data):
+        # writes from any thread, the loop thread does the writing
+        self.loop.call_soon_threadsafe(self.stream.write, data)
+
+    def received(self, data):
+        # called by the loop with every chunk of bytes from the server
+        if self.print_io:
+            print(color.text('magenta') + 'FROM SERVER <-- ' + data.decode('utf-8', 'replace') + color.reset())
+        for sent in self.reader.feed(data):
+            self.dispatch(sent['event'], sent['data'] if 'data' in sent else None)
+
+    def dispatch(self, event, data):
+        if event in ('ran', 'fatal'):
+            # replies resolve the future of their run call straight away, whoever is waiting for it
+            client._auto_handle(event, data)
+            return
+        with self.lock:
+            if not self.playing:
+                self.events.put((event, data))
+            else:
+                self.handle(event, data)
+
+    def handle(self, event, data):
+        # called with the lock held, so the events are merged and handed to the AI in the order they arrived
+        if event == 'delta':
+            # merged as soon as it arrives, the AI hears of it once it is done with what it is doing
+            client._merge_delta(data)
+            self.call_ai(client._delta_merged)
+        elif event in AI_EVENTS:
+            if event == 'over':
+                # the server closes the connection after the game is over, which is no longer unexpected,
+                # even though the AI may not have run its end yet
+                self.closing = True
+            self.call_ai(client._auto_handle, event, data)
+        else:
+            error_code.handle_error(error_code.UNKNOWN_EVENT_FROM_SERVER,
+                                    message='Could not auto handle event "{}".'.format(event))
+
+    def call_ai(self, function, *args):
+        self.executor.submit(function, *args).add_done_callback(self.check)
+
+    def check(self, future):
+        # the handlers report their own errors, anything else escaping the AI thread ends the client as it would
+        # have in the synchronous mode
+        e = future.exception()
+        if e:
+            error_code.handle_error(error_code.AI_ERRORED, e, 'AI errored while handling an event.')
+
+    def wait_for_event(self, event):
+        # waits for an event the network thread left in the queue, auto handling the others on the way
+        while True:
+            sent, data = self.events.get()
+            if event is not None and sent == event:
+                return data
+            client._auto_handle(sent, data)
+
+    def play(self):
+        # handles the events nobody waited for, lets the network thread handle the ones after them,
+        # and waits for the game to end
+        with self.lock:
+            while not self.events.empty():
+                self.handle(*self.events.get())
+            self.playing = True
+        try:
+            self.closed.wait()
+            if self.closing:
+                # the connection closed after the game ended, the AI still gets to run its end
+                self.executor.shutdown(wait=True)
+        except (KeyboardInterrupt, SystemExit):
+            client.disconnect()
+
+    def lost(self, exc):
+        self.closed.set()
+        if not self.closing:
+            error_code.handle_error(error_code.DISCONNECTED_UNEXPECTEDLY, exc,
+                                    'Lost the connection to the server.')
+
+    def close(self):
+        self.closing = True
+        if threading.current_thread() is self.thread:
+            self.stream.close()
+            return
+        self.loop.call_soon_threadsafe(self.stream.close)
+        # give what was written a moment to go out, as the process often exits right after
+        self.closed.wait(CLOSE_TIMEOUT)
@@ -14,3 +14,11 @@ class BaseGame(DeltaMergeable):
         """
         if id in self.game_objects:
             return self.game_objects[id]
+
+    def game_object_updated(self, game_object):
+        """ called by the game manager after a delta has changed a game object, for games that index their objects
+
+        Args:
+            game_object (BaseGameObject): the game object the delta changed
+        """
+        pass
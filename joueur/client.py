@@ -4,12 +4,24 @@ import sys
 import os
 import json
 import time
+import threading
+from collections import deque
+from concurrent.futures import Future
 from joueur.serializer import serialize, deserialize
 import joueur.error_code as error_code
 from joueur.game_manager import GameManager
 import joueur.ansi_color_coder as color
 
 EOT_CHAR = chr(4)
+EOT_BYTE = ord(EOT_CHAR)
+
+# run calls that do not wait for their reply, their frames go out with the next
+#   write and the reply is matched to them once it arrives
+FIRE_AND_FORGET = ('log',)
+
+# the read size starts small and doubles every time a read fills it, up to the most
+MIN_BUFFER_SIZE = 1024
+MAX_BUFFER_SIZE = 1024 * 1024
 
 
 # Client: A singleton module that talks to the server receiving game
@@ -20,20 +32,98 @@ class _Client:
 _client = _Client()
 
 
-def connect(hostname='localhost', port=3000, print_io=False):
+class _FrameReader:
+    """ Splits the raw bytes from the server into EOT framed JSON events
+    Bytes are only decoded once a whole frame has arrived, so a multi-byte character split over two reads is
+    decoded in one piece, and a large delta is not re-split every time another part of it arrives
+    buffer -- the bytes received after the last complete frame
+    scanned -- how much of the buffer is known to hold no EOT, where the next search starts
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.scanned = 0
+
+    def feed(self, data):
+        # adds received bytes, returns the events of the frames they complete, in order
+        buffer = self.buffer
+        buffer += data
+        end = buffer.find(EOT_BYTE, self.scanned)
+        if end < 0:
+            self.scanned = len(buffer)
+            return []
+        events = []
+        start = 0
+        with memoryview(buffer) as view:
+            while end >= 0:
+                with view[start:end] as frame:
+                    try:
+                        events.append(json.loads(str(frame, 'utf-8')))
+                    except ValueError as e:
+                        error_code.handle_error(
+                            error_code.MALFORMED_JSON, e,
+                            'Could not parse json "{}"'.format(
+                                bytes(frame).decode('utf-8', 'replace')))
+                start = end + 1
+                end = buffer.find(EOT_BYTE, start)
+        # the view is released before the buffer is resized
+        del buffer[:start]
+        self.scanned = len(buffer)
+        return events
+
+
+class _RunFuture(Future):
+    """ The future of a run call
+    In the synchronous mode nothing else reads the socket, so waiting on the
+    future sends its frame and handles the events that arrive until its reply
+    is among them
+    """
+
+    def _wait(self):
+        flush()
+        if not _client.transport:
+            while not self.done():
+                _handle_events(self)
+
+    def result(self, timeout=None):
+        self._wait()
+        return super().result(timeout)
+
+    def exception(self, timeout=None):
+        self._wait()
+        return super().exception(timeout)
+
+
+def connect(hostname='localhost', port=3000, print_io=False, use_async=False):
     _client.hostname = hostname
     _client.port = int(port)
 
     _client._print_io = print_io
-    _client._received_buffer = ""
+    _client._reader = _FrameReader()
     _client._events_stack = []
-    _client._buffer_size = 1024
+    # frames waiting to be written, and a future for every run call waiting
+    #   for its reply, in the order they were sent
+    _client._outgoing = []
+    _client._pending_runs = deque()
+    _client._send_lock = threading.RLock()
+    _client._buffer_size = MIN_BUFFER_SIZE
+    # reads land in this buffer, replaced by a larger one as the read size grows
+    _client._read_buffer = bytearray(_client._buffer_size)
     _client._timeout_time = 1.0
 
+    # the asyncio transport, when connected in asyncio mode
+    _client.transport = None
+
     print(color.text('cyan') + 'Connecting to:', _client.hostname + ':' + str(
         _client.port) + color.reset())
 
     try:
+        if use_async:
+            from joueur.async_client import AsyncTransport
+            _client.transport = AsyncTransport(_client.hostname, _client.port,
+                                               print_io)
+            return
+
         _client.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
         # Silly Windows
@@ -60,45 +150,96 @@ def setup(game, ai, manager):
     _client.manager = manager
 
 
-def _send_raw(string):
+# queues an event for the server, with the future of its reply for run calls
+def _queue(event, data, ran=None):
+    string = (json.dumps({
+        'sentTime': int(time.time()),
+        'event': event,
+        'data': serialize(data)
+    }) + EOT_CHAR).encode('utf-8')
+
     if _client._print_io:
         print(color.text('magenta') + 'TO SERVER --> ' + str(
             string) + color.reset())
-    _client.socket.send(string)
+
+    # the future goes in with its frame, so replies match the order of frames
+    with _client._send_lock:
+        if ran:
+            _client._pending_runs.append(ran)
+        _client._outgoing.append(string)
+
+
+# writes every queued frame in one go
+def flush():
+    with _client._send_lock:
+        if not _client._outgoing:
+            return
+        data = b''.join(_client._outgoing)
+        _client._outgoing = []
+        if _client.transport:
+            _client.transport.send(data)
+            return
+        try:
+            # send may write only part of a large frame, sendall writes it all
+            _client.socket.sendall(data)
+        except socket.error as e:
+            error_code.handle_error(error_code.DISCONNECTED_UNEXPECTEDLY, e,
+                                    'Error writing to the socket')
 
 
 # sends the server an event via socket
 def send(event, data):
-    _send_raw(
-        (json.dumps({
-            'sentTime': int(time.time()),
-            'event': event,
-            'data': serialize(data)
-        }) + EOT_CHAR).encode('utf-8')
-    )
+    _queue(event, data)
+    flush()
 
 
 def disconnect(exit_code=None):
-    if _client.socket:
-        _client.socket.close()
-
-
-def run_on_server(caller, function_name, args=None):
-    send('run', {
+    if _client.transport:
+        flush()
+        _client.transport.close()
+    elif _client.socket:
+        try:
+            # fire and forget calls still queued, such as logs
+            flush()
+        finally:
+            _client.socket.close()
+
+
+# runs a function on the server without waiting for it, returns a Future of
+#   the result, the frame goes out with the next write or flush, or once the
+#   future is waited on
+def run_on_server_async(caller, function_name, args=None):
+    ran = _RunFuture()
+    _queue('run', {
         'caller': caller,
         'functionName': function_name,
         'args': args
-    })
+    }, ran)
+    return ran
+
+
+def run_on_server(caller, function_name, args=None):
+    ran = run_on_server_async(caller, function_name, args)
+    if function_name in FIRE_AND_FORGET:
+        return None
 
-    ran_data = wait_for_event('ran')
-    return deserialize(ran_data, _client.game)
+    # the events before the reply are handled while waiting for it
+    return ran.result()
 
 
 def play():
-    wait_for_event(None)
+    flush()
+    if _client.transport:
+        _client.transport.play()
+    else:
+        wait_for_event(None)
 
 
 def wait_for_event(event):
+    flush()
+    if _client.transport:
+        return _client.transport.wait_for_event(event)
+
     while True:
         wait_for_events()
 
@@ -111,6 +252,15 @@ def wait_for_event(event):
                 _auto_handle(sent['event'], data)
 
 
+# handles the events that have arrived, until the future is done
+def _handle_events(future):
+    wait_for_events()
+
+    while len(_client._events_stack) > 0 and not future.done():
+        sent = _client._events_stack.pop()
+        _auto_handle(sent['event'], sent['data'] if 'data' in sent else None)
+
+
 # loops to check the socket for incoming data and ends once some events
 # get found
 def wait_for_events():
@@ -119,10 +269,9 @@ def wait_for_events():
 
     try:
         while True:
-            sent = None
+            size = 0
             try:
-                sent = _client.socket.recv(_client._buffer_size) \
-                    .decode('utf-8')
+                size = _client.socket.recv_into(_client._read_buffer)
             except socket.timeout:
                 pass  # timed out so keyboard/system interrupts can be handled,
                 #       hence the while true loop above
@@ -131,27 +280,24 @@ def wait_for_events():
                     error_code.CANNOT_READ_SOCKET, e,
                     'Error reading socket while waiting for events')
 
-            if not sent:
+            if not size:
                 continue
-            elif _client._print_io:
-                print(color.text('magenta') + 'FROM SERVER <-- ' + str(
-                    sent) + color.reset())
-
-            split = (_client._received_buffer + sent).split(EOT_CHAR)
-            # the last item will either be "" if the last char was an EOT_CHAR,
-            #   or a partial data we need to buffer anyways
-            _client._received_buffer = split.pop()
-
-            for json_str in reversed(split):
-                try:
-                    parsed = json.loads(json_str)
-                except ValueError as e:
-                    error_code.handle_error(error_code.MALFORMED_JSON, e,
-                                            'Could not parse json ""'.format(
-                                                json_str)
-                                            )
-
-                _client._events_stack.append(parsed)
+
+            with memoryview(_client._read_buffer)[:size] as received:
+                if _client._print_io:
+                    print(color.text('magenta') + 'FROM SERVER <-- ' + bytes(
+                        received).decode('utf-8', 'replace') + color.reset())
+                events = _client._reader.feed(received)
+
+            if size == _client._buffer_size and \
+                    _client._buffer_size < MAX_BUFFER_SIZE:
+                # the read filled the buffer, there is more waiting so read
+                #   more at once next time
+                _client._buffer_size *= 2
+                _client._read_buffer = bytearray(_client._buffer_size)
+
+            # the stack is popped from the end, so the first event goes last
+            _client._events_stack.extend(reversed(events))
 
             if len(_client._events_stack) > 0:
                 return
@@ -172,13 +318,30 @@ def _auto_handle(event, data=None):
             'Could not auto handle event "{}".'.format(event)))
 
 
+def _auto_handle_ran(data):
+    if not _client._pending_runs:
+        error_code.handle_error(error_code.UNKNOWN_EVENT_FROM_SERVER, message=(
+            'Got a "ran" event without a run call waiting for it.'))
+    _client._pending_runs.popleft().set_result(
+        deserialize(data, _client.game))
+
+
 def _auto_handle_delta(data):
+    _merge_delta(data)
+    _delta_merged()
+
+
+# the two halves of handling a delta, which the asyncio transport runs in
+#   different threads
+def _merge_delta(data):
     try:
         _client.manager.apply_delta_state(data)
     except:
         error_code.handle_error(error_code.DELTA_MERGE_FAILURE, sys.exc_info(),
                                 'Error merging delta')
 
+
+def _delta_merged():
     if _client.ai.player:  # then the AI is ready for updates
         _client.ai.game_updated()
 
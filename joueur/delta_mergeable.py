@@ -8,6 +8,10 @@ class DeltaMergeable():
         import joueur.client # avoid circular imports (sphinx won't build docs otherwise)
         return joueur.client.run_on_server(self, function_name, kwargs)
 
+    def _run_on_server_async(self, function_name, **kwargs):
+        import joueur.client
+        return joueur.client.run_on_server_async(self, function_name, kwargs)
+
     def __contains__(self, key):
         return hasattr(self, key)
 
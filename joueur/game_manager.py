@@ -16,11 +16,19 @@ class GameManager():
 
     ## applies a delta state (change in state information) to this game
     def apply_delta_state(self, delta):
+        changed = ()
         if 'gameObjects' in delta:
             self._init_game_objects(delta['gameObjects'])
+            changed = list(delta['gameObjects'])
 
         self._merge_delta(self.game, delta)
 
+        # let the game index the objects that changed, now that they are merged
+        for id in changed:
+            game_object = self.game.get_game_object(id)
+            if game_object:
+                self.game.game_object_updated(game_object)
+
     ## game objects can be refences in the delta states for cycles, they will all point to the game objects here.
     def _init_game_objects(self, delta_game_objects):
         for id, obj in delta_game_objects.items():
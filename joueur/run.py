@@ -12,7 +12,8 @@ def run(args):
     args.server = split_server[0]
     args.port = int((len(split_server) == 2 and split_server[1])) or args.port
 
-    joueur.client.connect(args.server, args.port, args.print_io)
+    joueur.client.connect(args.server, args.port, args.print_io,
+                          getattr(args, 'use_async', False))
 
     joueur.client.send("alias", args.game)
     game_name = joueur.client.wait_for_event("named")
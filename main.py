@@ -15,5 +15,6 @@ parser.add_argument('-r, --session', action='store', dest='session', default='*'
 parser.add_argument('--gameSettings', action='store', dest='game_settings', default=None, help='Any settings for the game server to force. Must be query string formatted (key=value&otherKey=otherValue)')
 parser.add_argument('--aiSettings', action='store', dest='ai_settings', default=None, help='Any settings for the AI. Delimit pairs by an ampersand (key=value&otherKey=otherValue)')
 parser.add_argument('--printIO', action='store_true', dest='print_io', help='(debugging) print IO through the TCP socket to the terminal')
+parser.add_argument('--async', action='store_true', dest='use_async', help='run the network on an asyncio event loop, so it goes on while the AI thinks')
 
 run(parser.parse_args())
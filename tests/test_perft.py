@@ -0,0 +1,63 @@
+import pytest
+from games.chess.ai import board_types
+
+'''
+Move generation and hashing of the board representations
+perft counts the leaf nodes of the legal move tree, which has to match the published counts for every backend
+The positions are chosen so no promotion is reached at the tested depth, as the boards only promote to queens
+'''
+
+START = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+KIWIPETE = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+POSITION_3 = '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1'
+
+# (fen, depth, leaf nodes)
+PERFT = [
+    (START, 3, 8902),
+    (KIWIPETE, 3, 97862),
+    (POSITION_3, 4, 43238),
+]
+
+
+def perft(board, depth):
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in list(board.gen_legal_moves()):
+        board.make_move(move)
+        nodes += perft(board, depth - 1)
+        board.unmake_move()
+    return nodes
+
+
+def z_hash(board):
+    # the hash of the board recomputed from scratch, PositionStack keeps it on the position on top
+    return board.z_hash() if hasattr(board, 'z_hash') else board.positions[-1].z_hash()
+
+
+def check_hashes(board, depth):
+    # walks the move tree, checking the incremental hash after every make and unmake
+    if depth == 0:
+        return
+    before = board.hash
+    for move in list(board.gen_legal_moves()):
+        board.make_move(move)
+        assert board.hash == z_hash(board), move
+        check_hashes(board, depth - 1)
+        board.unmake_move()
+        assert board.hash == before, move
+
+
+@pytest.mark.parametrize('board_type', sorted(board_types))
+@pytest.mark.parametrize('fen, depth, nodes', PERFT)
+def test_perft(board_type, fen, depth, nodes):
+    assert perft(board_types[board_type](fen), depth) == nodes
+
+
+@pytest.mark.parametrize('board_type', sorted(board_types))
+@pytest.mark.parametrize('fen', [START, KIWIPETE, POSITION_3])
+def test_hash_after_make_unmake(board_type, fen):
+    board = board_types[board_type](fen)
+    check_hashes(board, 2)
+    # every representation hashes a position the same way
+    assert board.hash == board_types['mutable'](fen).hash
@@ -0,0 +1,42 @@
+import pytest
+from games.chess.ai import board_types
+from games.chess.search import Searcher
+from games.chess.time_manager import TimeManager
+from games.chess.transposition import TranspositionTable
+
+'''
+Search regressions, run on every board representation
+'''
+
+# a7-a8=Q is the only move that saves white, and it captures nothing
+PROMOTION = '8/P5k1/8/3p4/8/2N5/1r2r3/7K w - - 0 1'
+
+
+def searcher(board, **options):
+    searcher = Searcher(board, TranspositionTable(1), clock=TimeManager.unlimited(), **options)
+    searcher.clock.start()
+    return searcher
+
+
+def promotion(board):
+    # the move of the pawn from a7 to a8
+    return next(move for move in board.gen_legal_moves() if board.move_pieces(move)[0] == 'P' and
+                board.is_tactical(move))
+
+
+@pytest.mark.parametrize('board_type', sorted(board_types))
+def test_promotion_is_not_futility_pruned(board_type):
+    board = board_types[board_type](PROMOTION)
+    pruned = searcher(board).negamax(1, 0, 1, 1)
+    full = searcher(board_types[board_type](PROMOTION), futility=False).negamax(1, 0, 1, 1)
+    assert pruned == full > 0
+
+
+@pytest.mark.parametrize('board_type', sorted(board_types))
+def test_promotion_is_not_a_killer(board_type):
+    board = board_types[board_type](PROMOTION)
+    search = searcher(board)
+    move = promotion(board)
+    search.cutoff(move, 4, 1)
+    assert move not in search.killers[1]
+    assert move not in search.history